@@ -4,11 +4,15 @@ Uses AST to safely parse Python code and build call graphs
 """
 import ast
 import os
+import sys
 from pathlib import Path
 from typing import Dict, Set, List, Tuple, Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
 from dataclasses import dataclass, field
 import hashlib
+from itertools import chain
 
 from ide.analyzer.security import SecurityValidator, sanitize_node_name
 
@@ -31,89 +35,93 @@ class FunctionInfo:
     parameters: List[str] = field(default_factory=list)
 
 
+# Leaf node types that can never contain a function definition or call
+_LEAF_NODE_TYPES = (
+    ast.Constant, ast.Name, ast.Load, ast.Store, ast.Del, ast.Pass,
+    ast.Break, ast.Continue, ast.Import, ast.ImportFrom, ast.Global, ast.Nonlocal,
+)
+
+
 class FunctionCallVisitor(ast.NodeVisitor):
     """AST visitor to extract function definitions and calls"""
     
-    def __init__(self, filepath: str, source: str):
+    def __init__(self, filepath: str, source: str, include_docstrings: bool = True,
+                 capture_source: bool = True):
         self.filepath = filepath
         self.functions: Dict[str, FunctionInfo] = {}
         self.current_function = None
         self.current_class = None
         self.source = source
+        self.include_docstrings = include_docstrings
+        # False skips signatures, docstrings and snippets (call graph only)
+        self.capture_source = capture_source
+
+        # Exact-type dispatch table (avoids per-node 'visit_' + name lookups)
+        self._dispatch = {
+            ast.ClassDef: self.visit_ClassDef,
+            ast.FunctionDef: self.visit_FunctionDef,
+            ast.AsyncFunctionDef: self.visit_AsyncFunctionDef,
+            ast.Call: self.visit_Call,
+        }
+        for leaf_type in _LEAF_NODE_TYPES:
+            self._dispatch[leaf_type] = self._skip
+
+    def visit(self, node: ast.AST):
+        """Dispatch node to its handler via the precomputed table"""
+        return self._dispatch.get(type(node), self._visit_children)(node)
+
+    def _visit_children(self, node: ast.AST):
+        """Visit all direct children of node"""
+        for child in ast.iter_child_nodes(node):
+            self.visit(child)
+
+    def _skip(self, node: ast.AST):
+        """Ignore subtrees that cannot contain definitions or calls"""
+        return None
     
     def visit_ClassDef(self, node: ast.ClassDef):
         """Visit class definition"""
         old_class = self.current_class
-        self.current_class = node.name
-        self.generic_visit(node)
+        self.current_class = sys.intern(node.name)
+        self._visit_children(node)
         self.current_class = old_class
     
     def visit_FunctionDef(self, node: ast.FunctionDef):
         """Visit function definition"""
-        func_name = node.name
-        
-        # Build full name with class if it's a method
-        if self.current_class:
-            full_name = f"{self.current_class}.{func_name}"
-            is_method = True
-        else:
-            full_name = func_name
-            is_method = False
-        
-        signature, params = self._build_signature(node)
-        docstring = ast.get_docstring(node) or ""
-        source_snippet = self._get_source_snippet(node)
-        end_line = getattr(node, 'end_lineno', node.lineno)
-        loc = max(1, end_line - node.lineno + 1)
-
-        # Create function info
-        func_info = FunctionInfo(
-            name=full_name,
-            file=self.filepath,
-            line=node.lineno,
-            calls=set(),
-            is_async=False,
-            is_method=is_method,
-            class_name=self.current_class,
-            signature=signature,
-            docstring=docstring,
-            source=source_snippet,
-            end_line=end_line,
-            loc=loc,
-            parameters=params
-        )
-        
-        self.functions[full_name] = func_info
-        
-        # Visit function body to find calls
-        old_function = self.current_function
-        self.current_function = full_name
-        self.generic_visit(node)
-        self.current_function = old_function
+        self._visit_function(node, is_async=False)
     
     def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef):
         """Visit async function definition"""
+        self._visit_function(node, is_async=True)
+    
+    def _visit_function(self, node: ast.AST, is_async: bool):
+        """Record a (possibly async) function definition and visit its body"""
         func_name = node.name
         
+        # Build full name with class if it's a method (sanitized for security)
         if self.current_class:
-            full_name = f"{self.current_class}.{func_name}"
+            full_name = sys.intern(sanitize_node_name(f"{self.current_class}.{func_name}"))
             is_method = True
         else:
-            full_name = func_name
+            full_name = sys.intern(sanitize_node_name(func_name))
             is_method = False
         
-        signature, params = self._build_signature(node)
-        docstring = ast.get_docstring(node) or ""
-        source_snippet = self._get_source_snippet(node)
+        if self.capture_source:
+            signature, params = self._build_signature(node)
+            docstring = (ast.get_docstring(node) or "") if self.include_docstrings else ""
+            source_snippet = self._get_source_snippet(node)
+        else:
+            signature, params, docstring, source_snippet = "", [], "", ""
         end_line = getattr(node, 'end_lineno', node.lineno)
         loc = max(1, end_line - node.lineno + 1)
 
+        # Create function info
         func_info = FunctionInfo(
             name=full_name,
             file=self.filepath,
             line=node.lineno,
             calls=set(),
-            is_async=True,
+            is_async=is_async,
             is_method=is_method,
             class_name=self.current_class,
             signature=signature,
@@ -126,9 +134,10 @@ class FunctionCallVisitor(ast.NodeVisitor):
         
         self.functions[full_name] = func_info
         
+        # Visit function body to find calls
         old_function = self.current_function
         self.current_function = full_name
-        self.generic_visit(node)
+        self._visit_children(node)
         self.current_function = old_function
     
     def visit_Call(self, node: ast.Call):
@@ -136,20 +145,31 @@ class FunctionCallVisitor(ast.NodeVisitor):
         if self.current_function:
             called_func = self._get_call_name(node.func)
             if called_func:
-                self.functions[self.current_function].calls.add(called_func)
+                # Interned so repeated names share one string object
+                self.functions[self.current_function].calls.add(sys.intern(called_func))
         
-        self.generic_visit(node)
+        # A bare name has nothing left to visit; attribute chains may still
+        # hold nested calls such as factory().method()
+        if type(node.func) is not ast.Name:
+            self.visit(node.func)
+        for arg in node.args:
+            self.visit(arg)
+        for keyword in node.keywords:
+            self.visit(keyword.value)
     
+    # Call target extractors keyed by exact node type
+    _CALL_HANDLERS = {
+        ast.Name: lambda node: node.id,
+        # Handle method calls like obj.method()
+        ast.Attribute: lambda node: (
+            f"{node.value.id}.{node.attr}" if type(node.value) is ast.Name else node.attr
+        ),
+    }
+
     def _get_call_name(self, node) -> str:
         """Extract function name from call node"""
-        if isinstance(node, ast.Name):
-            return node.id
-        elif isinstance(node, ast.Attribute):
-            # Handle method calls like obj.method()
-            if isinstance(node.value, ast.Name):
-                return f"{node.value.id}.{node.attr}"
-            return node.attr
-        return None
+        handler = self._CALL_HANDLERS.get(type(node))
+        return handler(node) if handler else None
 
     def _build_signature(self, node: ast.AST) -> Tuple[str, List[str]]:
         """Build function signature string"""
@@ -207,13 +227,82 @@ class FunctionCallVisitor(ast.NodeVisitor):
         return snippet or ""
 
 
+# Files above this size are usually generated/vendored code (protobuf, Qt, ...)
+MAX_ANALYZE_FILE_SIZE = 1024 * 1024  # 1MB
+
+
+def _read_and_hash(filepath: str) -> Tuple[str, str, Optional[bytes]]:
+    """
+    Read a file and hash its contents (hashing stage)
+
+    hashlib releases the GIL on large buffers, so this scales across threads.
+
+    Returns:
+        (filepath, content hash, raw bytes) - bytes is None if unreadable
+    """
+    try:
+        with open(filepath, 'rb') as f:
+            data = f.read()
+    except Exception:
+        return filepath, "", None
+    return filepath, hashlib.blake2b(data, digest_size=16).hexdigest(), data
+
+
+def _parse_source(filepath: str, data: bytes, include_docstrings: bool = True,
+                  capture_source: bool = True) -> Dict[str, FunctionInfo]:
+    """
+    Parse file contents and extract functions (parsing stage)
+
+    Module-level so it can run inside a worker process.
+
+    Returns:
+        Dictionary of sanitized function names to FunctionInfo
+    """
+    try:
+        # Decode like text-mode open() would (UTF-8, universal newlines)
+        source = data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+        
+        # Parse with AST (safe - never executes code)
+        tree = ast.parse(source, filename=filepath)
+        
+        # Visit nodes
+        visitor = FunctionCallVisitor(filepath, source, include_docstrings, capture_source)
+        visitor.visit(tree)
+        
+        # Names were sanitized as they were recorded
+        return visitor.functions
+        
+    except SyntaxError as e:
+        print(f"Syntax error in {filepath}: {e}")
+        return {}
+    except Exception as e:
+        print(f"Error parsing {filepath}: {e}")
+        return {}
+
+
 class FunctionFlowAnalyzer:
     """
     Main analyzer class - coordinates multi-file analysis
+
+    Files are processed in two stages: a thread pool reads and hashes files
+    (GIL-releasing work), and cache misses are handed to the parsing pool as
+    soon as their hash is known. Parsing runs in threads by default; pass
+    use_processes=True to parse in worker processes instead (only worth it
+    for large projects, and only from a process that is safe to fork/spawn -
+    not the Qt GUI process).
     """
     
-    def __init__(self, max_workers: int = 4):
+    # Below this many files, process start-up costs more than it saves
+    MIN_FILES_FOR_PROCESSES = 8
+    
+    def __init__(self, max_workers: int = 4, use_processes: bool = False,
+                 include_docstrings: bool = True, max_file_bytes: int = MAX_ANALYZE_FILE_SIZE,
+                 capture_source: bool = True):
         self.max_workers = max_workers
+        self.use_processes = use_processes
+        self.include_docstrings = include_docstrings
+        self.capture_source = capture_source
+        self.max_file_bytes = max_file_bytes
         self.security_validator = None
         self.cache = {}  # File hash -> parsed data
     
@@ -229,35 +318,109 @@ class FunctionFlowAnalyzer:
         """
         self.security_validator = SecurityValidator(project_root)
         
-        # Get safe file list
-        from ide.analyzer.security import get_safe_file_list
-        python_files = get_safe_file_list(project_root)
+        # Get safe file list (stat'ed once while scanning)
+        from ide.analyzer.security import get_safe_file_entries
+        python_files = get_safe_file_entries(project_root)
         
         if not python_files:
             return {}
         
         print(f"Analyzing {len(python_files)} Python files...")
         
-        # Parallel processing
-        all_functions = {}
+        # Security validation
+        sized_files = []
+        for filepath, stat_result in python_files:
+            is_valid, error = self.security_validator.validate_stat(filepath, stat_result)
+            if not is_valid:
+                print(f"Skipping {filepath}: {error}")
+                continue
+            size = self._get_accepted_size(filepath, stat_result.st_size)
+            if size is None:
+                continue
+            sized_files.append((size, filepath))
+        
+        # Largest files first so long parses don't straggle at the end
+        sized_files.sort(reverse=True)
         
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            future_to_file = {
-                executor.submit(self._analyze_file, filepath): filepath 
-                for filepath in python_files
-            }
+        results = []  # Per-file function dicts, merged once at the end
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as hash_pool, \
+                self._create_parse_pool(len(sized_files)) as parse_pool:
+            parse_futures = {}
+            
+            # Stage 1 -> 2: resolve cache hits here and schedule misses in submission
+            # (largest-first) order, so big parses start first. Each hash future is
+            # popped before waiting on it, so file bytes are not held until shutdown.
+            hash_futures = deque(hash_pool.submit(_read_and_hash, filepath)
+                                 for _, filepath in sized_files)
+            while hash_futures:
+                filepath, file_hash, data = hash_futures.popleft().result()
+                if data is None:
+                    print(f"Error reading {filepath}")
+                    continue
+                if file_hash in self.cache:
+                    results.append(self.cache[file_hash])
+                    continue
+                parse_future = parse_pool.submit(
+                    _parse_source, filepath, data, self.include_docstrings, self.capture_source
+                )
+                # Only the path is kept: the pool holds the bytes until the parse is done
+                parse_futures[parse_future] = (filepath, file_hash)
             
-            for future in as_completed(future_to_file):
-                filepath = future_to_file[future]
+            for future in as_completed(parse_futures):
+                filepath, file_hash = parse_futures[future]
                 try:
                     functions = future.result()
-                    all_functions.update(functions)
+                except BrokenProcessPool:
+                    # Worker processes unavailable - re-read and parse in-process instead
+                    _, _, data = _read_and_hash(filepath)
+                    if data is None:
+                        print(f"Error reading {filepath}")
+                        continue
+                    functions = _parse_source(filepath, data, self.include_docstrings, self.capture_source)
                 except Exception as e:
                     print(f"Error analyzing {filepath}: {e}")
+                    continue
+                self.cache[file_hash] = functions
+                results.append(functions)
+        
+        all_functions = dict(chain.from_iterable(functions.items() for functions in results))
         
         print(f"Found {len(all_functions)} functions")
         return all_functions
     
+    def _get_accepted_size(self, filepath: str, size: Optional[int] = None) -> Optional[int]:
+        """
+        Check size before hashing/parsing - huge generated files add no signal
+        
+        Args:
+            filepath: Path to Python file
+            size: File size if already known (e.g. from a scan's stat result)
+        
+        Returns:
+            File size in bytes, or None if the file should be skipped
+            (too large or unreadable)
+        """
+        if size is None:
+            try:
+                size = os.path.getsize(filepath)
+            except OSError as e:
+                print(f"Skipping unreadable file {filepath}: {e}")
+                return None
+        if size > self.max_file_bytes:
+            print(f"Skipping large file {filepath} ({size} bytes)")
+            return None
+        return size
+    
+    def _create_parse_pool(self, file_count: int) -> Executor:
+        """Create the executor used for the parsing stage"""
+        if self.use_processes and file_count >= self.MIN_FILES_FOR_PROCESSES:
+            try:
+                return ProcessPoolExecutor(max_workers=self.max_workers)
+            except (OSError, NotImplementedError) as e:
+                print(f"Process pool unavailable, parsing in threads: {e}")
+        return ThreadPoolExecutor(max_workers=self.max_workers)
+    
     def _analyze_file(self, filepath: str) -> Dict[str, FunctionInfo]:
         """
         Analyze a single Python file
@@ -273,49 +436,21 @@ class FunctionFlowAnalyzer:
         if not is_valid:
             print(f"Skipping {filepath}: {error}")
             return {}
+        if self._get_accepted_size(filepath) is None:
+            return {}
+        
+        _, file_hash, data = _read_and_hash(filepath)
+        if data is None:
+            print(f"Error reading {filepath}")
+            return {}
         
         # Check cache
-        file_hash = self._get_file_hash(filepath)
         if file_hash in self.cache:
             return self.cache[file_hash]
         
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                source = f.read()
-            
-            # Parse with AST (safe - never executes code)
-            tree = ast.parse(source, filename=filepath)
-            
-            # Visit nodes
-            visitor = FunctionCallVisitor(filepath, source)
-            visitor.visit(tree)
-            
-            # Sanitize function names for security
-            sanitized_functions = {}
-            for name, info in visitor.functions.items():
-                safe_name = sanitize_node_name(name)
-                info.name = safe_name
-                sanitized_functions[safe_name] = info
-            
-            # Cache result
-            self.cache[file_hash] = sanitized_functions
-            
-            return sanitized_functions
-            
-        except SyntaxError as e:
-            print(f"Syntax error in {filepath}: {e}")
-            return {}
-        except Exception as e:
-            print(f"Error parsing {filepath}: {e}")
-            return {}
-    
-    def _get_file_hash(self, filepath: str) -> str:
-        """Get hash of file for caching"""
-        try:
-            with open(filepath, 'rb') as f:
-                return hashlib.md5(f.read()).hexdigest()
-        except Exception:
-            return ""
+        functions = _parse_source(filepath, data, self.include_docstrings, self.capture_source)
+        self.cache[file_hash] = functions
+        return functions
     
     def analyze_file(self, filepath: str) -> Dict[str, FunctionInfo]:
         """
@@ -7,8 +7,20 @@ from typing import Dict, Set, List, Tuple
 from collections import defaultdict, deque
 from dataclasses import asdict
 
+try:
+    import orjson  # Optional, faster JSON encoding
+except ImportError:
+    orjson = None
+
 from ide.analyzer.flow_analyzer import FunctionInfo
-from ide.analyzer.security import MAX_NODES, sanitize_node_name
+from ide.analyzer.security import MAX_CYCLES, MAX_NODES, sanitize_node_name
+
+
+def _dumps(obj) -> bytes:
+    """Encode obj as compact UTF-8 JSON"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
 
 
 class CallGraph:
@@ -17,7 +29,7 @@ class CallGraph:
     def __init__(self):
         self.nodes: Dict[str, FunctionInfo] = {}
         self.edges: Dict[str, Set[str]] = defaultdict(set)
-        self.reverse_edges: Dict[str, Set[str]] = defaultdict(set)
+        self._reverse_edges = None  # Built on demand from edges
         self._stats = None
     
     def add_function(self, func_info: FunctionInfo):
@@ -31,7 +43,18 @@ class CallGraph:
     def add_edge(self, from_func: str, to_func: str):
         """Add a directed edge (function call)"""
         self.edges[from_func].add(to_func)
-        self.reverse_edges[to_func].add(from_func)
+        self._reverse_edges = None
+    
+    @property
+    def reverse_edges(self) -> Dict[str, Set[str]]:
+        """Callee -> callers index, built lazily from edges"""
+        if self._reverse_edges is None:
+            reverse_edges = defaultdict(set)
+            for from_func, to_funcs in self.edges.items():
+                for to_func in to_funcs:
+                    reverse_edges[to_func].add(from_func)
+            self._reverse_edges = reverse_edges
+        return self._reverse_edges
     
     def get_callers(self, func_name: str) -> Set[str]:
         """Get all functions that call this function"""
@@ -81,34 +104,142 @@ class CallGraph:
         
         return self._stats
     
-    def find_cycles(self) -> List[List[str]]:
-        """Detect circular call chains"""
+    def find_cycles(self, max_cycles: int = MAX_CYCLES) -> List[List[str]]:
+        """
+        Detect circular call chains
+        
+        Enumerates elementary cycles with Johnson's algorithm, run separately
+        on each strongly connected component. All traversals are iterative,
+        so deep call chains cannot hit the recursion limit.
+        
+        Args:
+            max_cycles: Stop after this many cycles
+            
+        Returns:
+            List of cycles, each closed by repeating its first node
+        """
         cycles = []
-        visited = set()
-        rec_stack = set()
         
-        def dfs(node, path):
-            visited.add(node)
-            rec_stack.add(node)
-            path.append(node)
+        # Self-recursive functions are one-node cycles
+        for node, calls in self.edges.items():
+            if node in calls:
+                cycles.append([node, node])
+                if len(cycles) >= max_cycles:
+                    return cycles
+        
+        components = [scc for scc in self._strongly_connected_components(self.edges) if len(scc) > 1]
+        while components:
+            component = components.pop()
+            adjacency = {
+                node: [n for n in self.edges.get(node, ()) if n in component and n != node]
+                for node in component
+            }
+            start = next(iter(component))
+            for cycle in self._circuits_from(start, adjacency):
+                cycles.append(cycle)
+                if len(cycles) >= max_cycles:
+                    return cycles
             
-            for neighbor in self.edges.get(node, []):
-                if neighbor not in visited:
-                    dfs(neighbor, path.copy())
-                elif neighbor in rec_stack:
-                    # Found a cycle
-                    cycle_start = path.index(neighbor)
-                    cycle = path[cycle_start:] + [neighbor]
-                    if cycle not in cycles:
-                        cycles.append(cycle)
+            # Remaining cycles avoid start; re-split what is left of the component
+            component.discard(start)
+            del adjacency[start]
+            components.extend(
+                scc for scc in self._strongly_connected_components(adjacency) if len(scc) > 1
+            )
+        
+        return cycles
+    
+    @staticmethod
+    def _strongly_connected_components(adjacency: Dict[str, Set[str]]) -> List[Set[str]]:
+        """Tarjan's SCC algorithm (iterative), restricted to adjacency's keys"""
+        index_of = {}
+        lowlink = {}
+        on_stack = set()
+        scc_stack = []
+        components = []
+        counter = 0
+        
+        for root in adjacency:
+            if root in index_of:
+                continue
+            index_of[root] = lowlink[root] = counter
+            counter += 1
+            scc_stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(adjacency[root]))]
             
-            rec_stack.remove(node)
+            while work:
+                node, neighbors = work[-1]
+                advanced = False
+                for neighbor in neighbors:
+                    if neighbor not in adjacency:
+                        continue
+                    if neighbor not in index_of:
+                        index_of[neighbor] = lowlink[neighbor] = counter
+                        counter += 1
+                        scc_stack.append(neighbor)
+                        on_stack.add(neighbor)
+                        work.append((neighbor, iter(adjacency[neighbor])))
+                        advanced = True
+                        break
+                    if neighbor in on_stack:
+                        lowlink[node] = min(lowlink[node], index_of[neighbor])
+                if advanced:
+                    continue
+                
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index_of[node]:
+                    component = set()
+                    while True:
+                        member = scc_stack.pop()
+                        on_stack.discard(member)
+                        component.add(member)
+                        if member == node:
+                            break
+                    components.append(component)
         
-        for node in self.nodes:
-            if node not in visited:
-                dfs(node, [])
+        return components
+    
+    @staticmethod
+    def _circuits_from(start: str, adjacency: Dict[str, List[str]]):
+        """Yield every elementary cycle through start (Johnson's circuit search)"""
+        path = [start]
+        blocked = {start}
+        blocked_map = defaultdict(set)
+        closed = set()
+        stack = [(start, list(adjacency[start]))]
         
-        return cycles
+        while stack:
+            node, neighbors = stack[-1]
+            if neighbors:
+                next_node = neighbors.pop()
+                if next_node == start:
+                    yield path + [start]
+                    closed.update(path)
+                elif next_node not in blocked:
+                    path.append(next_node)
+                    stack.append((next_node, list(adjacency[next_node])))
+                    closed.discard(next_node)
+                    blocked.add(next_node)
+                    continue
+            
+            if not neighbors:
+                if node in closed:
+                    # Unblock node and everything waiting on it
+                    pending = [node]
+                    while pending:
+                        item = pending.pop()
+                        if item in blocked:
+                            blocked.discard(item)
+                            pending.extend(blocked_map.pop(item, ()))
+                else:
+                    for neighbor in adjacency[node]:
+                        blocked_map[neighbor].add(node)
+                stack.pop()
+                path.pop()
     
     def get_subgraph(self, root_nodes: List[str], max_depth: int = 3) -> 'CallGraph':
         """
@@ -145,18 +276,23 @@ class CallGraph:
         
         return subgraph
     
+    @staticmethod
+    def _node_to_dict(info: FunctionInfo) -> Dict:
+        """Serializable summary of a single node"""
+        return {
+            'name': info.name,
+            'file': info.file,
+            'line': info.line,
+            'is_async': info.is_async,
+            'is_method': info.is_method,
+            'class_name': info.class_name
+        }
+    
     def to_dict(self) -> Dict:
         """Convert graph to dictionary for serialization"""
         return {
             'nodes': {
-                name: {
-                    'name': info.name,
-                    'file': info.file,
-                    'line': info.line,
-                    'is_async': info.is_async,
-                    'is_method': info.is_method,
-                    'class_name': info.class_name
-                }
+                name: self._node_to_dict(info)
                 for name, info in self.nodes.items()
             },
             'edges': {
@@ -164,10 +300,21 @@ class CallGraph:
             }
         }
     
+    def _iter_json_chunks(self):
+        """Yield the JSON encoding of to_dict() piece by piece"""
+        dumps = _dumps
+        yield b'{"nodes":{'
+        for index, (name, info) in enumerate(self.nodes.items()):
+            yield (b',' if index else b'') + dumps(name) + b':' + dumps(self._node_to_dict(info))
+        yield b'},"edges":{'
+        for index, (node, calls) in enumerate(self.edges.items()):
+            yield (b',' if index else b'') + dumps(node) + b':' + dumps(list(calls))
+        yield b'}}'
+    
     def save_to_json(self, filepath: str):
-        """Save graph to JSON file"""
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(self.to_dict(), f, indent=2)
+        """Save graph to JSON file (streamed, one node/edge list at a time)"""
+        with open(filepath, 'wb') as f:
+            f.writelines(self._iter_json_chunks())
     
     @classmethod
     def from_dict(cls, data: Dict) -> 'CallGraph':
@@ -4,14 +4,29 @@ Prevents code execution, path traversal, and resource exhaustion
 """
 import os
 import html
-from pathlib import Path
-from typing import Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 
 # Security limits
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB per file
 MAX_FILES = 1000  # Maximum files to analyze
 MAX_DEPTH = 100  # Maximum recursion depth in call chains
 MAX_NODES = 5000  # Maximum nodes in graph
+MAX_CYCLES = 1000  # Maximum call cycles to enumerate
+
+# Stat calls are spread over threads only for batches at least this large
+PARALLEL_STAT_MIN_FILES = 64
+
+# Directories never scanned for source files
+IGNORED_DIRS = frozenset({
+    '__pycache__', '.git', '.venv', 'venv',
+    'node_modules', '.idea', 'build', 'dist'
+})
+
+# Characters escaped in node names
+_NODE_NAME_TRANSLATION = str.maketrans({
+    '<': '&lt;', '>': '&gt;', "'": '&#39;', '"': '&quot;'
+})
 
 
 def is_safe_path(base_path: str, target_path: str) -> bool:
@@ -26,15 +41,19 @@ def is_safe_path(base_path: str, target_path: str) -> bool:
         True if path is safe, False otherwise
     """
     try:
-        base = Path(base_path).resolve()
-        target = Path(target_path).resolve()
-        
-        # Check if target is within base
-        return str(target).startswith(str(base))
+        # Symlinks are resolved, so a link pointing outside base is rejected
+        base = os.path.realpath(base_path)
+        return _is_within(base, os.path.realpath(target_path))
     except Exception:
         return False
 
 
+def _is_within(base_abspath: str, target_abspath: str) -> bool:
+    """Check that an absolute path lies inside an absolute base directory"""
+    # commonpath avoids the prefix bug where '/a/bb' startswith '/a/b'
+    return os.path.commonpath([base_abspath, target_abspath]) == base_abspath
+
+
 def is_safe_file_size(filepath: str) -> bool:
     """
     Check if file size is within safety limits
@@ -65,6 +84,21 @@ def sanitize_text(text: str) -> str:
     return html.escape(str(text), quote=True)
 
 
+def sanitize_text_str(text: str) -> str:
+    """
+    Sanitize text that is already a str for HTML rendering
+    
+    Fast path of sanitize_text for hot loops: skips the str() coercion.
+    
+    Args:
+        text: Raw text (must be a str)
+        
+    Returns:
+        HTML-escaped text
+    """
+    return html.escape(text, True)
+
+
 def sanitize_node_name(name: str) -> str:
     """
     Sanitize function/node names for safe display
@@ -75,10 +109,8 @@ def sanitize_node_name(name: str) -> str:
     Returns:
         Sanitized name
     """
-    # Remove any potentially dangerous characters
-    safe_name = name.replace("<", "&lt;").replace(">", "&gt;")
-    safe_name = safe_name.replace("'", "&#39;").replace('"', "&quot;")
-    return safe_name[:200]  # Limit length
+    # Remove any potentially dangerous characters (single translate pass)
+    return name.translate(_NODE_NAME_TRANSLATION)[:200]  # Limit length
 
 
 def is_python_file(filepath: str) -> bool:
@@ -105,41 +137,96 @@ def get_safe_file_list(root_dir: str, max_files: int = MAX_FILES) -> list:
     Returns:
         List of safe file paths
     """
+    return [filepath for filepath, _ in get_safe_file_entries(root_dir, max_files)]
+
+
+def get_safe_file_entries(root_dir: str, max_files: int = MAX_FILES) -> List[Tuple[str, os.stat_result]]:
+    """
+    Get safe Python files to analyze together with their stat results
+    
+    Each file is stat'ed exactly once; pass the result on to
+    SecurityValidator.validate_stat instead of re-checking the file.
+    
+    Args:
+        root_dir: Root directory to scan
+        max_files: Maximum number of files to return
+        
+    Returns:
+        List of (file path, stat result) tuples
+    """
     safe_files = []
     
-    try:
-        for root, dirs, files in os.walk(root_dir):
-            # Skip common ignored directories
-            dirs[:] = [d for d in dirs if d not in {
-                '__pycache__', '.git', '.venv', 'venv', 
-                'node_modules', '.idea', 'build', 'dist'
-            }]
-            
-            for file in files:
-                if len(safe_files) >= max_files:
-                    break
-                    
-                if is_python_file(file):
-                    filepath = os.path.join(root, file)
-                    
-                    # Validate path and size
-                    if is_safe_path(root_dir, filepath) and is_safe_file_size(filepath):
-                        safe_files.append(filepath)
-            
+    def collect_sized(candidates, executor):
+        """Stat candidate entries (in parallel for large batches) and keep small files"""
+        if len(candidates) >= PARALLEL_STAT_MIN_FILES:
+            stat_results = executor.map(_stat_entry, candidates)
+        else:
+            stat_results = map(_stat_entry, candidates)
+        for entry, stat_result in zip(candidates, stat_results):
             if len(safe_files) >= max_files:
                 break
+            if stat_result is not None and stat_result.st_size <= MAX_FILE_SIZE:
+                safe_files.append((entry.path, stat_result))
+    
+    try:
+        # Explicit scandir traversal: DirEntry carries the file type, so only
+        # .py files cost a stat. Symlinks are never followed, which keeps the
+        # walk inside root_dir without resolving paths.
+        pending_dirs = [root_dir]
+        candidates = []
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+            while pending_dirs and len(safe_files) < max_files:
+                current_dir = pending_dirs.pop()
+                try:
+                    with os.scandir(current_dir) as entries:
+                        subdirs = []
+                        for entry in entries:
+                            if entry.is_dir(follow_symlinks=False):
+                                # Skip common ignored directories
+                                if entry.name not in IGNORED_DIRS:
+                                    subdirs.append(entry.path)
+                            # Cheap extension test first (inlined is_python_file)
+                            elif (entry.name.endswith('.py')
+                                  and len(safe_files) + len(candidates) < max_files
+                                  and entry.is_file(follow_symlinks=False)):
+                                candidates.append(entry)
+                except OSError:
+                    # Unreadable directory - skip it like os.walk does
+                    continue
+                
+                # Reversed so directories are visited in listing order (as os.walk)
+                pending_dirs.extend(reversed(subdirs))
                 
+                # Stat in batches: only once enough candidates to fill the list
+                # exist - keeps the max_files cutoff exact
+                if len(safe_files) + len(candidates) >= max_files:
+                    collect_sized(candidates, executor)
+                    candidates = []
+            
+            collect_sized(candidates, executor)
+    
     except Exception as e:
         print(f"Error scanning directory: {e}")
     
     return safe_files
 
 
+def _stat_entry(entry: os.DirEntry) -> Optional[os.stat_result]:
+    """Stat a directory entry without following symlinks"""
+    try:
+        return entry.stat(follow_symlinks=False)
+    except OSError:
+        return None
+
+
 class SecurityValidator:
     """Validates operations for security compliance"""
     
     def __init__(self, project_root: str):
-        self.project_root = Path(project_root).resolve()
+        self.project_root = os.path.abspath(project_root)
+        # Separator-terminated roots, so containment is a single prefix test
+        self._root_str = os.path.join(self.project_root, '')
+        self._real_root_str = os.path.join(os.path.realpath(project_root), '')
         self.files_processed = 0
         self.nodes_created = 0
     
@@ -154,8 +241,8 @@ class SecurityValidator:
         if self.files_processed >= MAX_FILES:
             return False, f"Maximum file limit reached ({MAX_FILES})"
         
-        # Check path safety
-        if not is_safe_path(str(self.project_root), filepath):
+        # Check path safety (symlinks resolved - a link may point outside the project)
+        if not os.path.realpath(filepath).startswith(self._real_root_str):
             return False, "Path is outside project directory"
         
         # Check file existence
@@ -173,6 +260,37 @@ class SecurityValidator:
         self.files_processed += 1
         return True, ""
     
+    def validate_stat(self, filepath: str, stat_result: os.stat_result) -> Tuple[bool, str]:
+        """
+        Validate a file using a stat result gathered while scanning
+        
+        Same checks as validate_file, but existence and size come from
+        stat_result instead of new filesystem calls. Containment is checked
+        lexically: get_safe_file_entries never follows symlinks, so its
+        paths cannot lead outside the project.
+        
+        Returns:
+            (is_valid, error_message)
+        """
+        # Check file count
+        if self.files_processed >= MAX_FILES:
+            return False, f"Maximum file limit reached ({MAX_FILES})"
+        
+        # Check path safety
+        if not os.path.abspath(filepath).startswith(self._root_str):
+            return False, "Path is outside project directory"
+        
+        # Check file type
+        if not is_python_file(filepath):
+            return False, "Not a Python file"
+        
+        # Check file size
+        if stat_result.st_size > MAX_FILE_SIZE:
+            return False, f"File too large (max {MAX_FILE_SIZE} bytes)"
+        
+        self.files_processed += 1
+        return True, ""
+    
     def validate_node_creation(self) -> Tuple[bool, str]:
         """
         Validate if new node can be created
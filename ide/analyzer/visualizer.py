@@ -2,184 +2,504 @@
 Visualizer for Function Flow Graphs
 Uses PyVis for interactive HTML-based visualization
 """
+import hashlib
+import heapq
 import os
+import re
 import tempfile
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Tuple
+from urllib.parse import quote
 from pyvis.network import Network
 
-from ide.analyzer.graph_builder import CallGraph
-from ide.analyzer.security import sanitize_text
+try:
+    import numpy as np  # Optional, faster trace percentiles/buckets; networkx layouts need it
+except ImportError:
+    np = None
 
+try:
+    import networkx as nx  # Optional, used to lay out large graphs offline
+except ImportError:
+    nx = None
 
-class Visualizer:
-    """
-    Creates interactive visualizations of function call graphs
+from ide.analyzer.graph_builder import CallGraph, _dumps
+from ide.analyzer.security import sanitize_text, sanitize_text_str
+
+# Shared output directory for generated graphs
+_OUTPUT_DIR = Path(tempfile.gettempdir()) / "Py_ide_flow"
+
+# Tags that custom HTML is injected next to
+_PAGE_TAGS = re.compile(rb'<body>|</head>|</body>')
+
+if os.altsep:
+    # Windows paths may mix separators and carry drives - keep the full logic
+    _basename = os.path.basename
+else:
+    def _basename(path: str) -> str:
+        """os.path.basename without the genericpath/fspath overhead"""
+        return path.rpartition(os.sep)[2]
+
+
+def _write_page(net: Network, html_path: Path, body_start: bytes = b"", head_end: bytes = b"",
+                body_end: bytes = b"") -> bytes:
     """
+    Render a pyvis network to HTML, insert snippets and write the page once
     
-    def __init__(self):
-        self.output_dir = Path(tempfile.gettempdir()) / "Py_ide_flow"
-        self.output_dir.mkdir(exist_ok=True)
+    The page is generated in memory instead of through Network.save_graph,
+    so it is never written and read back just to be patched (save_graph
+    also copies pyvis's lib/ folder into the working directory). Snippets
+    are passed already encoded and inserted in a single scan.
     
-    def render(self, graph: CallGraph, output_filename: str = "function_flow.html") -> str:
-        """
-        Render graph to interactive HTML
+    Args:
+        net: Network to render
+        html_path: Path of the page
+        body_start: HTML inserted right after <body>
+        head_end: HTML inserted right before </head>
+        body_end: HTML inserted right before </body>
         
-        Args:
-            graph: CallGraph to visualize
-            output_filename: Name of output HTML file
-            
-        Returns:
-            Path to generated HTML file
-        """
-        output_path = self.output_dir / output_filename
+    Returns:
+        The final page bytes
+    """
+    insertions = {
+        b'<body>': b'<body>' + body_start,
+        b'</head>': head_end + b'</head>',
+        b'</body>': body_end + b'</body>',
+    }
+    html = _PAGE_TAGS.sub(lambda match: insertions[match.group(0)],
+                          net.generate_html().encode('utf-8'))
+    html_path.write_bytes(html)
+    return html
+
+
+def _write_explanations_script(output_path: Path, explanations: dict) -> str:
+    """
+    Write AI explanations to a script file next to the page
+    
+    Keeping the payload out of the page keeps the HTML small, lets the
+    page load it only when a node is first clicked (see _add_ai_modal), and
+    means explanation text can never break out of an inline <script>.
+    
+    Args:
+        output_path: Path of the HTML page
+        explanations: Sanitized node id -> explanation text
         
-        # Create PyVis network
-        net = Network(
-            height="800px",
-            width="100%",
-            bgcolor="#2B2B2B",
-            font_color="#A9B7C6",
-            directed=True
-        )
+    Returns:
+        File name of the script, relative to the page
+    """
+    script_path = output_path.with_name(f"{output_path.stem}.explanations.js")
+    script_path.write_bytes(b"window.aiExplanations=" + _dumps(explanations) + b";\n")
+    return script_path.name
+
+
+# Node names recur across renders of the same project, so their escaped
+# forms (node labels) are memoized
+_cached_sanitize = lru_cache(maxsize=4096)(sanitize_text_str)
+
+
+# Default vis.js physics stabilization budget (iterations run in the browser)
+STABILIZATION_ITERATIONS = 200
+
+# Number of finished pages kept for re-rendering unchanged graphs
+RENDER_CACHE_SIZE = 8
+
+# Graphs up to this many nodes render in a few milliseconds and bypass the
+# page cache (no hashing, and they never evict pages of large graphs)
+SMALL_GRAPH_NODES = 30
+
+# Graphs with more nodes than this get a precomputed layout (layout="auto")
+LARGE_GRAPH_NODES = 150
+
+# Graphs with more nodes than this get compact tooltips (tooltip="auto")
+COMPACT_TOOLTIP_NODES = 500
+
+# Graphs with more nodes than this open with hub nodes clustered (cluster="auto")
+CLUSTER_GRAPH_NODES = 500
+
+# Graphs with more edges than this draw them as straight lines
+LARGE_GRAPH_EDGES = 300
+
+# Trace overlay (fill, border) colors by speed bucket
+_TRACE_COLORS = (
+    ("#555555", "#777777"),  # Not executed - gray
+    ("#6A8759", "#8FC34B"),  # Fast (below p50) - green
+    ("#CC7832", "#FFC66D"),  # Medium (below p90) - orange
+    ("#BC3F3C", "#FF6B6B"),  # Slow - red
+)
+
+# Spread of precomputed node coordinates, in vis.js canvas units
+_LAYOUT_SCALE = 1000
+
+# Node colors by kind
+_NODE_COLORS = {
+    "async": "#6A8759",   # Green for async
+    "method": "#CC7832",  # Orange for methods
+    "func": "#9876AA",    # Purple for functions
+}
+
+
+def _network_options(stabilization_iterations: int = STABILIZATION_ITERATIONS,
+                     border_width: int = 2, selection_width: Optional[int] = 3,
+                     node_count: int = 0, edge_count: int = 0) -> dict:
+    """
+    Build the vis.js options shared by all render paths
+    
+    Assigned to Network.options directly, so pyvis does not re-parse a JSON
+    string per render. A fresh dict is returned each call.
+    
+    Args:
+        stabilization_iterations: Physics stabilization iterations
+        border_width: Node border width (selected nodes get one more)
+        selection_width: Width of selected edges, None for the vis.js default
+        node_count: Number of nodes that will be drawn
+        edge_count: Number of edges that will be drawn
         
-        # Configure physics for better layout with prominent arrows
-        net.set_options("""
-        {
-          "physics": {
+    Returns:
+        Options dict
+    """
+    edges = {
+        "arrows": {"to": {"enabled": True, "scaleFactor": 1.2, "type": "arrow"}},
+        "color": {
+            "inherit": False,
+            "color": "#6A9FE0",
+            "highlight": "#8FC34B",
+            "hover": "#FFC66D"
+        },
+        "width": 2,
+        # Curves are re-evaluated every frame; straight lines once there are many
+        "smooth": False if edge_count > LARGE_GRAPH_EDGES else {"type": "continuous"},
+    }
+    if selection_width is not None:
+        edges["selectionWidth"] = selection_width
+    
+    options = {
+        "physics": {
             "forceAtlas2Based": {
-              "gravitationalConstant": -80,
-              "centralGravity": 0.015,
-              "springLength": 150,
-              "springConstant": 0.08
+                "gravitationalConstant": -80,
+                "centralGravity": 0.015,
+                "springLength": 150,
+                "springConstant": 0.08
             },
             "maxVelocity": 50,
             "solver": "forceAtlas2Based",
             "timestep": 0.35,
-            "stabilization": {"iterations": 200}
-          },
-          "nodes": {
-            "font": {
-              "size": 16,
-              "color": "#A9B7C6",
-              "face": "Consolas"
-            },
-            "borderWidth": 2,
-            "borderWidthSelected": 3
-          },
-          "edges": {
-            "arrows": {
-              "to": {
-                "enabled": true,
-                "scaleFactor": 1.2,
-                "type": "arrow"
-              }
-            },
-            "color": {
-              "inherit": false,
-              "color": "#6A9FE0",
-              "highlight": "#8FC34B",
-              "hover": "#FFC66D"
-            },
-            "width": 2,
-            "smooth": {
-              "type": "cubicBezier",
-              "forceDirection": "horizontal",
-              "roundness": 0.5
-            },
-            "selectionWidth": 3
-          },
-          "interaction": {
-            "hover": true,
-            "navigationButtons": true,
-            "keyboard": true
-          }
-        }
-        """)
-        
-        # Add nodes
-        for func_name, func_info in graph.nodes.items():
-            # Sanitize for security
-            safe_name = sanitize_text(func_name)
-            safe_file = sanitize_text(os.path.basename(func_info.file))
-            
-            # Determine node color
-            if func_info.is_async:
-                color = "#6A8759"  # Green for async
-            elif func_info.is_method:
-                color = "#CC7832"  # Orange for methods
-            else:
-                color = "#9876AA"  # Purple for functions
-            
-            # Prepare additional metadata
-            signature = sanitize_text(func_info.signature or "()")
-            doc_preview = sanitize_text((func_info.docstring or "").strip().replace('\n', ' '))
-            if len(doc_preview) > 200:
-                doc_preview = doc_preview[:200] + "..."
-            loc = func_info.loc or 0
-            callers = len(graph.get_callers(func_name))
-            callees = len(graph.get_callees(func_name))
-            code_preview = sanitize_text((func_info.source or "").strip())
-            if len(code_preview) > 400:
-                code_preview = code_preview[:400] + "\n..."
-            code_preview = code_preview.replace('\n', '<br>')
-
-            async_badge = "<span style='color:#6A8759;'>async</span>" if func_info.is_async else ""
-            class_line = (
-                f"<span style='color:#808080;'>Class:</span> {sanitize_text(func_info.class_name)}<br>"
-                if func_info.class_name else ""
-            )
-            tooltip = (
-                f"<div style='font-family:Consolas,monospace;font-size:12px;color:#A9B7C6;'>"
-                f"<strong style='color:#6A8759;'>{safe_name}{signature}</strong> {async_badge}<br>"
-                f"<span style='color:#808080;'>File:</span> {safe_file}:{func_info.line}<br>"
-                f"{class_line}"
-                f"<span style='color:#808080;'>Lines:</span> {loc} | "
-                f"<span style='color:#808080;'>Calls:</span> {callees} | "
-                f"<span style='color:#808080;'>Called by:</span> {callers}<br>"
-                f"<span style='color:#808080;'>Docstring:</span> {doc_preview or '—'}<br>"
-                f"<hr style='border:1px solid #3C3F41;'>"
-                f"<div style='max-height:140px;overflow:auto;background:#2B2B2B;padding:6px;border-radius:4px;'>"
-                f"<code>{code_preview or 'No source snippet available.'}</code>"
-                f"</div>"
-                f"</div>"
-            )
-            
-            # Add node
-            net.add_node(
-                safe_name,
-                label=safe_name,
-                title=tooltip,
-                color=color,
-                size=20 + len(graph.get_callers(func_name)) * 5  # Size by popularity
-            )
-        
-        # Add edges
-        for from_func, to_funcs in graph.edges.items():
-            safe_from = sanitize_text(from_func)
-            for to_func in to_funcs:
-                safe_to = sanitize_text(to_func)
-                # Only add edge if both nodes exist
-                if safe_to in [sanitize_text(n) for n in graph.nodes.keys()]:
-                    net.add_edge(safe_from, safe_to)
+            "stabilization": {"iterations": stabilization_iterations}
+        },
+        "nodes": {
+            "font": {"size": 16, "color": "#A9B7C6", "face": "Consolas"},
+            "borderWidth": border_width,
+            "borderWidthSelected": border_width + 1,
+            # Nodes that carry a "value" are sized by vis.js within this range
+            "scaling": {"min": 15, "max": 60}
+        },
+        "edges": edges,
+        # Edges are not redrawn while panning/zooming - the main per-frame cost
+        "interaction": {
+            "hover": True,
+            "navigationButtons": True,
+            "keyboard": True,
+            "hideEdgesOnDrag": True,
+            "hideNodesOnDrag": False
+        },
+    }
+    if node_count > LARGE_GRAPH_NODES:
+        # improvedLayout runs a Kamada-Kawai pass over every node before physics
+        options["layout"] = {"improvedLayout": False}
+    return options
+
+
+def _static_layout(graph: CallGraph) -> Optional[dict]:
+    """
+    Precompute node positions so the browser can skip physics
+    
+    Args:
+        graph: CallGraph to lay out
         
-        # Generate HTML
-        net.save_graph(str(output_path))
+    Returns:
+        Mapping of node name -> (x, y), or None if networkx/numpy is unavailable
+    """
+    if nx is None:
+        return None
+    
+    layout_graph = nx.DiGraph()
+    layout_graph.add_nodes_from(graph.nodes)
+    nodes = graph.nodes
+    layout_graph.add_edges_from(
+        (from_func, to_func)
+        for from_func, to_funcs in graph.edges.items() if from_func in nodes
+        for to_func in to_funcs if to_func in nodes
+    )
+    try:
+        return nx.spring_layout(layout_graph, seed=42, scale=_LAYOUT_SCALE)
+    except ImportError:
+        # spring_layout needs numpy
+        return None
+
+
+def _trace_percentiles(trace_stats: dict) -> Tuple[float, float]:
+    """
+    p50 and p90 of average call time over the executed functions of a trace
+    
+    Only the two order statistics are selected (numpy.partition, O(N)) when
+    numpy is available; otherwise the times are sorted.
+    
+    Args:
+        trace_stats: Function name -> trace stats ('call_count', 'total_time')
         
-        # Add custom styles
-        self._enhance_html(output_path)
+    Returns:
+        (p50, p90) in seconds, with defaults for empty or single-call traces
+    """
+    avg_times = [
+        stats['total_time'] / stats['call_count']
+        for stats in trace_stats.values() if stats.get('call_count', 0) > 0
+    ]
+    count = len(avg_times)
+    if not count:
+        return 0.001, 0.01
+    
+    p50_index = count // 2
+    p90_index = int(count * 0.9)
+    if np is not None:
+        selected = np.partition(np.array(avg_times, dtype=np.float64), (p50_index, p90_index))
+        p50, p90 = float(selected[p50_index]), float(selected[p90_index])
+    else:
+        avg_times.sort()
+        p50, p90 = avg_times[p50_index], avg_times[p90_index]
+    return p50, (p90 if count > 1 else 0.01)
+
+
+def _executed_node_stats(graph: CallGraph, trace_stats: dict, p50: float, p90: float) -> dict:
+    """
+    Trace figures of the graph's executed functions, computed in one pass
+    
+    Only functions with calls are visited (usually a minority of the graph);
+    speed buckets are computed over all of them at once, vectorized when
+    numpy is available.
+    
+    Args:
+        graph: CallGraph being rendered
+        trace_stats: Function name -> trace stats
+        p50: Median average call time (see _trace_percentiles)
+        p90: 90th percentile average call time
         
-        print(f"Visualization saved to: {output_path}")
-        return str(output_path)
+    Returns:
+        Function name -> (speed bucket, call count, total time, average time, stats);
+        buckets index _TRACE_COLORS
+    """
+    nodes = graph.nodes
+    executed = [
+        (name, stats) for name, stats in trace_stats.items()
+        if stats.get('call_count', 0) > 0 and name in nodes
+    ]
+    call_counts = [stats['call_count'] for _, stats in executed]
+    total_times = [stats.get('total_time', 0) for _, stats in executed]
+    avg_times = [total / count for total, count in zip(total_times, call_counts)]
     
-    def _enhance_html(self, html_path: Path):
-        """Add custom CSS and JavaScript to generated HTML"""
-        try:
-            with open(html_path, 'r', encoding='utf-8') as f:
-                html = f.read()
-            
-            # Add custom styles
-            custom_css = """
+    if np is not None and avg_times:
+        avg_array = np.array(avg_times, dtype=np.float64)
+        buckets = (1 + (avg_array >= p50).astype(int) + (avg_array >= p90).astype(int)).tolist()
+    else:
+        buckets = [1 + (avg_time >= p50) + (avg_time >= p90) for avg_time in avg_times]
+    
+    return {
+        name: (bucket, call_count, total_time, avg_time, stats)
+        for (name, stats), bucket, call_count, total_time, avg_time
+        in zip(executed, buckets, call_counts, total_times, avg_times)
+    }
+
+
+def _node_ids(graph: CallGraph) -> dict:
+    """
+    Short vis.js node ids: each node's position in graph.nodes
+    
+    Integer ids keep edge endpoints and per-node payloads small; names are
+    only sent once, as node labels.
+    """
+    return {name: index for index, name in enumerate(graph.nodes)}
+
+
+def _edge_records(graph: CallGraph, node_ids: dict) -> list:
+    """Directed vis.js edge dicts for every call between two graph nodes"""
+    edges = []
+    append = edges.append
+    for from_func, to_funcs in graph.edges.items():
+        from_id = node_ids.get(from_func)
+        if from_id is None:
+            continue
+        for to_func in to_funcs:
+            # Only add edge if both nodes exist
+            to_id = node_ids.get(to_func)
+            if to_id is not None:
+                append({"from": from_id, "to": to_id, "arrows": "to"})
+    return edges
+
+
+def _load_network(net: Network, nodes: list, edges: list):
+    """
+    Bulk-load node and edge dicts into a pyvis Network
+    
+    Network.add_node/add_edge scan the list of node ids on every call
+    (O(N^2 + E*N) overall). Node ids here are unique integer indexes and
+    edges are already restricted to existing nodes, so the lists are set
+    directly.
+    """
+    net.nodes = nodes
+    net.node_ids = [node["id"] for node in nodes]
+    net.node_map = {node["id"]: node for node in nodes}
+    net.edges = edges
+
+
+def _tooltip_level(tooltip: str, node_count: int) -> str:
+    """Resolve tooltip="auto" to "full" or "compact" by graph size"""
+    if tooltip == "auto":
+        return "compact" if node_count > COMPACT_TOOLTIP_NODES else "full"
+    return tooltip
+
+
+def _cluster_html(cluster: str, node_count: int) -> bytes:
+    """Hub clustering script for the end of <body>, b"" when clustering is off"""
+    if cluster == "hubs" or (cluster == "auto" and node_count > CLUSTER_GRAPH_NODES):
+        return _CLUSTER_SCRIPT
+    return b""
+
+
+def _node_color(func_info) -> str:
+    """Node color for a function by kind"""
+    kind = "async" if func_info.is_async else "method" if func_info.is_method else "func"
+    return _NODE_COLORS[kind]
+
+
+# Compact node tooltip, filled per node with str.format_map
+_COMPACT_TOOLTIP_TEMPLATE = "{name} · {callers}←/{callees}→"
+
+
+# Builds full tooltips in the browser from window.nodeMeta, on first hover of
+# each node. Values go in through textContent, so they are never parsed as HTML.
+_NODE_TOOLTIP_SCRIPT = """
+            <script>
+                (function () {
+                    const nodeMeta = window.nodeMeta || {};
+
+                    function add(parent, tag, style, text) {
+                        const element = document.createElement(tag);
+                        if (style) element.style.cssText = style;
+                        if (text !== undefined) element.textContent = text;
+                        parent.appendChild(element);
+                        return element;
+                    }
+
+                    function field(parent, label, value) {
+                        add(parent, 'span', 'color:#808080;', label + ' ');
+                        parent.appendChild(document.createTextNode(value));
+                    }
+
+                    function buildTooltip(name, meta) {
+                        const root = document.createElement('div');
+                        root.style.cssText = 'font-family:Consolas,monospace;font-size:12px;color:#A9B7C6;';
+                        add(root, 'strong', 'color:#6A8759;', name + meta.sig);
+                        if (meta.async) {
+                            root.appendChild(document.createTextNode(' '));
+                            add(root, 'span', 'color:#6A8759;', 'async');
+                        }
+                        add(root, 'br');
+                        field(root, 'File:', meta.file + ':' + meta.line);
+                        add(root, 'br');
+                        if (meta.cls) {
+                            field(root, 'Class:', meta.cls);
+                            add(root, 'br');
+                        }
+                        field(root, 'Lines:', meta.loc + ' | ');
+                        field(root, 'Calls:', meta.callees + ' | ');
+                        field(root, 'Called by:', meta.callers);
+                        add(root, 'br');
+                        field(root, 'Docstring:', meta.doc || '—');
+                        if ('code' in meta) {
+                            add(root, 'hr', 'border:1px solid #3C3F41;');
+                            const box = add(root, 'div', 'max-height:140px;overflow:auto;background:#2B2B2B;padding:6px;border-radius:4px;');
+                            add(box, 'code', 'white-space:pre-wrap;', meta.code || 'No source snippet available.');
+                        }
+                        if ('trace' in meta) {
+                            const trace = meta.trace;
+                            const color = trace ? trace.color : '#555555';
+                            const box = add(root, 'div', 'margin-top:8px;padding:8px;background:#1E1E1E;border-left:3px solid ' + color + ';border-radius:3px;');
+                            if (trace) {
+                                add(box, 'strong', 'color:' + color + ';', '⚡ Execution Trace');
+                                add(box, 'br');
+                                field(box, 'Calls:', '');
+                                add(box, 'strong', null, String(trace.calls));
+                                add(box, 'br');
+                                field(box, 'Total:', trace.total.toFixed(2) + 'ms');
+                                add(box, 'br');
+                                field(box, 'Avg:', trace.avg.toFixed(3) + 'ms');
+                                add(box, 'br');
+                                field(box, 'Min:', trace.min.toFixed(3) + 'ms | ');
+                                field(box, 'Max:', trace.max.toFixed(3) + 'ms');
+                            } else {
+                                add(box, 'span', 'color:#808080;', '⚠️ Not executed in trace');
+                            }
+                        }
+                        if (meta.ai) {
+                            const indicator = add(root, 'div', 'margin-top:6px;padding:6px;background:#1E1E1E;border-left:3px solid #6A8759;border-radius:3px;');
+                            add(indicator, 'small', 'color:#6A8759;', '🤖 AI Explanation Available - Click to view');
+                        }
+                        return root;
+                    }
+
+                    // vis.js shows the popup after tooltipDelay, so a title set on hover is picked up
+                    network.on('hoverNode', function (params) {
+                        const meta = nodeMeta[params.node];
+                        if (meta) {
+                            nodeMeta[params.node] = null;
+                            const name = nodes.get(params.node).label;
+                            nodes.update({id: params.node, title: buildTooltip(name, meta)});
+                        }
+                    });
+                })();
+            </script>
+            """.encode('utf-8')
+
+
+# Collapses hubs with their neighbours so large graphs draw only a fraction
+# of their nodes; a cluster opens on double-click
+_CLUSTER_SCRIPT = b"""
+            <script>
+                network.clusterByHubsize(undefined, {
+                    processProperties: function (clusterOptions, childNodes) {
+                        clusterOptions.label = childNodes.length + ' functions';
+                        clusterOptions.value = childNodes.length;
+                        return clusterOptions;
+                    },
+                    clusterNodeProperties: {shape: 'dot', color: '#6897BB', borderWidth: 3}
+                });
+                network.on('doubleClick', function (params) {
+                    if (params.nodes.length > 0 && network.isCluster(params.nodes[0])) {
+                        network.openCluster(params.nodes[0]);
+                    }
+                });
+            </script>
+            """
+
+
+def _node_tooltip_html(node_meta: list) -> bytes:
+    """
+    Page snippet carrying the node metadata and the script that turns it into tooltips
+
+    Args:
+        node_meta: Tooltip fields of every node, indexed by node id
+
+    Returns:
+        HTML for the end of <body>, or b"" when there is nothing to show
+    """
+    if not node_meta:
+        return b""
+    # Docstrings and sources may contain "</script>" - keep them inside the JSON string
+    payload = _dumps(node_meta).replace(b"</", b"<\\/")
+    return b"<script>window.nodeMeta=" + payload + b";</script>" + _NODE_TOOLTIP_SCRIPT
+
+
+# Page chrome added by _enhance_html, encoded once
+_CUSTOM_CSS_HTML = """
             <style>
                 body {
                     margin: 0;
@@ -230,9 +550,9 @@ class Visualizer:
                     margin-right: 10px;
                 }
             </style>
-            """
-            
-            info_panel = """
+            """.encode('utf-8')
+
+_INFO_PANEL_HTML = """
             <div id="info-panel">
                 <h3>Function Flow Graph</h3>
                 <p>🔵 Hover over nodes for details</p>
@@ -253,17 +573,280 @@ class Visualizer:
                     <span>Async</span>
                 </div>
             </div>
-            """
+            """.encode('utf-8')
+
+
+class Visualizer:
+    """
+    Creates interactive visualizations of function call graphs
+    """
+    
+    _output_dir_created = False
+    
+    # Final page bytes by render key - shared because a Visualizer is
+    # created per render
+    _render_cache: "OrderedDict[str, bytes]" = OrderedDict()
+    
+    def __init__(self):
+        self.output_dir = _OUTPUT_DIR
+        # Visualizers are created per render; only touch the filesystem once
+        if not Visualizer._output_dir_created:
+            self.output_dir.mkdir(exist_ok=True)
+            Visualizer._output_dir_created = True
+    
+    def render(self, graph: CallGraph, output_filename: str = "function_flow.html",
+               extra_body_html: str = "",
+               stabilization_iterations: int = STABILIZATION_ITERATIONS,
+               layout: str = "auto", tooltip: str = "auto", cluster: str = "auto") -> str:
+        """
+        Render graph to interactive HTML
+        
+        Args:
+            graph: CallGraph to visualize
+            output_filename: Name of output HTML file
+            extra_body_html: Extra HTML inserted at the top of <body>
+            stabilization_iterations: Physics stabilization iterations run in the browser
+            layout: "physics" (in-browser forceAtlas2), "static" (precomputed
+                positions, physics off) or "auto" (static above LARGE_GRAPH_NODES)
+            tooltip: "full", "compact" (name and call counts), "none" (name only)
+                or "auto" (compact above COMPACT_TOOLTIP_NODES)
+            cluster: "hubs" (open with hub nodes clustered), "none" or "auto"
+                (hubs above CLUSTER_GRAPH_NODES)
             
-            # Insert custom elements
-            html = html.replace('<body>', '<body>' + info_panel)
-            html = html.replace('</head>', custom_css + '</head>')
+        Returns:
+            Path to generated HTML file
+        """
+        output_path = self.output_dir / output_filename
+        
+        # Unchanged graph and settings: reuse the finished page
+        cache_key = None
+        if len(graph.nodes) > SMALL_GRAPH_NODES:
+            cache_key = self._render_key(
+                graph, "render", extra_body_html, stabilization_iterations, layout, tooltip, cluster
+            )
+        if self._write_cached_page(cache_key, output_path):
+            print(f"Visualization saved to: {output_path}")
+            return str(output_path)
+        
+        net, node_meta = self._build_network(graph, self._full_node_meta, stabilization_iterations,
+                                             layout, tooltip)
+        
+        # Generate HTML with custom styles
+        body_end = _node_tooltip_html(node_meta) + _cluster_html(cluster, len(graph.nodes))
+        self._cache_page(cache_key, self._enhance_html(net, output_path, extra_body_html, body_end))
+        
+        print(f"Visualization saved to: {output_path}")
+        return str(output_path)
+    
+    @staticmethod
+    def _render_key(graph: CallGraph, *settings) -> str:
+        """
+        Hash everything a rendered page depends on
+        
+        Covers every node field shown in tooltips, the edges and the render
+        settings; node and edge order are kept since they shape the output.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        update = digest.update
+        update(repr(settings).encode('utf-8', 'surrogatepass'))
+        for func_name, func_info in graph.nodes.items():
+            update(repr((
+                func_name, func_info.file, func_info.line, func_info.loc,
+                func_info.is_async, func_info.is_method, func_info.class_name,
+                func_info.signature, func_info.docstring, func_info.source
+            )).encode('utf-8', 'surrogatepass'))
+        for from_func, to_funcs in graph.edges.items():
+            update(repr((from_func, tuple(to_funcs))).encode('utf-8', 'surrogatepass'))
+        return digest.hexdigest()
+    
+    @staticmethod
+    def _write_cached_page(cache_key: Optional[str], output_path: Path) -> bool:
+        """Write a cached page to output_path; False on a cache miss or uncached render"""
+        if cache_key is None:
+            return False
+        cache = Visualizer._render_cache
+        html = cache.get(cache_key)
+        if html is None:
+            return False
+        cache.move_to_end(cache_key)
+        output_path.write_bytes(html)
+        return True
+    
+    @staticmethod
+    def _cache_page(cache_key: Optional[str], html: Optional[bytes]):
+        """Remember a finished page (uncached renders and failed pages are skipped)"""
+        if cache_key is None or html is None:
+            return
+        cache = Visualizer._render_cache
+        cache[cache_key] = html
+        cache.move_to_end(cache_key)
+        while len(cache) > RENDER_CACHE_SIZE:
+            cache.popitem(last=False)
+    
+    def _build_network(self, graph: CallGraph, full_node_meta,
+                       stabilization_iterations: int = STABILIZATION_ITERATIONS,
+                       layout: str = "auto", tooltip: str = "auto") -> Tuple[Network, dict]:
+        """
+        Build the pyvis network shared by render and render_with_ai_explanations
+        
+        Full tooltips are not stored on the nodes: their fields are collected
+        into node_meta and turned into tooltips by the page on first hover
+        (see _node_tooltip_html).
+        
+        Args:
+            graph: CallGraph to visualize
+            full_node_meta: Callable (func_info, callers, callees) -> tooltip
+                fields, only called when tooltips are at the "full" level
+            stabilization_iterations: Physics stabilization iterations run in the browser
+            layout: Layout mode, as for render
+            tooltip: Tooltip level, as for render
             
-            with open(html_path, 'w', encoding='utf-8') as f:
-                f.write(html)
+        Returns:
+            (network with options, nodes and edges set, tooltip fields indexed
+            by node id - empty unless tooltips are at the "full" level)
+        """
+        # Create PyVis network
+        net = Network(
+            height="800px",
+            width="100%",
+            bgcolor="#2B2B2B",
+            font_color="#A9B7C6",
+            directed=True
+        )
+        
+        # Only calls between graph nodes are drawn (not print, len, ...)
+        edges = _edge_records(graph, _node_ids(graph))
+        
+        # Configure physics for better layout with prominent arrows
+        net.options = _network_options(stabilization_iterations, node_count=len(graph.nodes),
+                                       edge_count=len(edges))
+        
+        # Large graphs: lay out offline instead of stabilizing in the browser
+        positions = None
+        if layout == "static" or (layout == "auto" and len(graph.nodes) > LARGE_GRAPH_NODES):
+            positions = _static_layout(graph)
+            if positions is not None:
+                net.options["physics"] = {"enabled": False}
+            else:
+                print("Static layout unavailable (needs networkx and numpy) - using browser physics")
+        
+        caller_counts, callee_counts = self._call_counts(graph)
+        
+        # Node dicts are collected and loaded into the network in one go
+        nodes = []
+        node_meta = []
+        font = {"color": net.font_color}
+        tooltip_level = _tooltip_level(tooltip, len(graph.nodes))
+        
+        # Add nodes (ids are positions in graph.nodes, see _node_ids)
+        for node_id, (func_name, func_info) in enumerate(graph.nodes.items()):
+            safe_name = _cached_sanitize(func_name)
+            callers = caller_counts[func_name]
+            callees = callee_counts[func_name]
+            
+            # Full tooltips are built client-side, only for hovered nodes
+            title = None
+            if tooltip_level == "full":
+                node_meta.append(full_node_meta(func_info, callers, callees))
+            elif tooltip_level == "compact":
+                title = _COMPACT_TOOLTIP_TEMPLATE.format_map(
+                    {'name': safe_name, 'callers': callers, 'callees': callees}
+                )
+            else:
+                title = safe_name
+            
+            # Add node
+            node = {
+                "id": node_id,
+                "label": safe_name,
+                "shape": "dot",
+                "color": _node_color(func_info),
+                "value": callers,  # Size by popularity (scaled client-side)
+                "font": font
+            }
+            if title is not None:
+                node["title"] = title
+            if positions is not None:
+                x, y = positions[func_name]
+                node["x"] = float(x)
+                node["y"] = float(y)
+                node["physics"] = False
+            nodes.append(node)
+        
+        # Add nodes and edges
+        _load_network(net, nodes, edges)
+        return net, node_meta
+    
+    @staticmethod
+    def _full_node_meta(func_info, callers: int, callees: int) -> dict:
+        """Fields of the full node tooltip: signature, location, call counts, docstring and code"""
+        doc_preview = (func_info.docstring or "").strip()
+        if len(doc_preview) > 200:
+            doc_preview = doc_preview[:200] + "..."
+        code_preview = (func_info.source or "").strip()
+        if len(code_preview) > 400:
+            code_preview = code_preview[:400] + "\n..."
+        
+        meta = Visualizer._base_node_meta(func_info, callers, callees, doc_preview)
+        meta["code"] = code_preview
+        return meta
+    
+    @staticmethod
+    def _ai_node_meta(func_info, callers: int, callees: int, has_explanation: bool) -> dict:
+        """Fields of the AI view tooltip (the explanation itself opens in a modal)"""
+        doc_preview = (func_info.docstring or "").strip()
+        if len(doc_preview) > 150:
+            doc_preview = doc_preview[:150] + "..."
+        
+        meta = Visualizer._base_node_meta(func_info, callers, callees, doc_preview)
+        if has_explanation:
+            meta["ai"] = 1
+        return meta
+    
+    @staticmethod
+    def _base_node_meta(func_info, callers: int, callees: int, doc_preview: str) -> dict:
+        """Tooltip fields shared by every view (raw text - the page escapes it)"""
+        meta = {
+            "sig": func_info.signature or "()",
+            "file": _basename(func_info.file),
+            "line": func_info.line,
+            "loc": func_info.loc or 0,
+            "callers": callers,
+            "callees": callees,
+            "doc": doc_preview.replace('\n', ' '),
+        }
+        # Optional fields are left out of the payload when unset
+        if func_info.is_async:
+            meta["async"] = 1
+        if func_info.class_name:
+            meta["cls"] = func_info.class_name
+        return meta
+    
+    @staticmethod
+    def _call_counts(graph: CallGraph):
+        """Caller and callee counts for every node, read straight off the adjacency maps"""
+        reverse_edges = graph.reverse_edges
+        edges = graph.edges
+        caller_counts = {name: len(reverse_edges.get(name, ())) for name in graph.nodes}
+        callee_counts = {name: len(edges.get(name, ())) for name in graph.nodes}
+        return caller_counts, callee_counts
+    
+    def _enhance_html(self, net: Network, html_path: Path, extra_body_html: str = "",
+                      body_end: bytes = b"") -> Optional[bytes]:
+        """Write the page with custom CSS, panels, extra body HTML and body_end in one pass (returns the page)"""
+        try:
+            # Insert custom elements (single scan for all tags)
+            return _write_page(
+                net,
+                html_path,
+                body_start=extra_body_html.encode('utf-8') + _INFO_PANEL_HTML,
+                head_end=_CUSTOM_CSS_HTML,
+                body_end=body_end
+            )
                 
         except Exception as e:
             print(f"Error enhancing HTML: {e}")
+            return None
     
     def render_subgraph(
         self, 
@@ -298,11 +881,12 @@ class Visualizer:
         Returns:
             Path to HTML file
         """
-        # Generate base visualization
-        html_path = self.render(graph, output_filename)
-        
-        # Get statistics
+        # Get statistics (bound to locals once)
         stats = graph.get_stats()
+        total_functions, total_calls, async_functions, isolated, avg_calls = (
+            stats['total_functions'], stats['total_calls'], stats['async_functions'],
+            stats['isolated_functions'], stats['average_calls_per_function']
+        )
         
         # Create stats HTML
         stats_html = f"""
@@ -319,29 +903,21 @@ class Visualizer:
             min-width: 200px;
         ">
             <h3 style="margin: 0 0 10px 0; color: #6A8759;">Statistics</h3>
-            <p><strong>Functions:</strong> {stats['total_functions']}</p>
-            <p><strong>Calls:</strong> {stats['total_calls']}</p>
-            <p><strong>Async Functions:</strong> {stats['async_functions']}</p>
-            <p><strong>Isolated:</strong> {stats['isolated_functions']}</p>
-            <p><strong>Avg Calls/Function:</strong> {stats['average_calls_per_function']:.2f}</p>
+            <p><strong>Functions:</strong> {total_functions}</p>
+            <p><strong>Calls:</strong> {total_calls}</p>
+            <p><strong>Async Functions:</strong> {async_functions}</p>
+            <p><strong>Isolated:</strong> {isolated}</p>
+            <p><strong>Avg Calls/Function:</strong> {avg_calls:.2f}</p>
         </div>
         """
         
-        # Add stats to HTML
-        try:
-            with open(html_path, 'r', encoding='utf-8') as f:
-                html = f.read()
-            
-            html = html.replace('<body>', '<body>' + stats_html)
-            
-            with open(html_path, 'w', encoding='utf-8') as f:
-                f.write(html)
-        except Exception as e:
-            print(f"Error adding stats: {e}")
-        
-        return html_path
+        # Render with the stats panel injected in the same enhancement pass
+        return self.render(graph, output_filename, extra_body_html=stats_html)
     
-    def render_with_ai_explanations(self, graph: CallGraph, ai_explanations: dict, output_filename: str = "function_flow.html") -> str:
+    def render_with_ai_explanations(self, graph: CallGraph, ai_explanations: dict, output_filename: str = "function_flow.html",
+                                    stabilization_iterations: int = STABILIZATION_ITERATIONS,
+                                    layout: str = "auto", tooltip: str = "auto",
+                                    cluster: str = "auto") -> str:
         """
         Render graph with AI-powered explanations for nodes
         
@@ -349,165 +925,70 @@ class Visualizer:
             graph: CallGraph to visualize
             ai_explanations: Dictionary mapping function names to AI explanations
             output_filename: Name of output HTML file
+            stabilization_iterations: Physics stabilization iterations run in the browser
+            layout: "physics", "static" or "auto", as for render
+            tooltip: "full", "compact" (name and call counts), "none" (name only)
+                or "auto" (compact above COMPACT_TOOLTIP_NODES)
+            cluster: "hubs", "none" or "auto", as for render
             
         Returns:
             Path to generated HTML file
         """
         output_path = self.output_dir / output_filename
         
-        # Create PyVis network
-        net = Network(
-            height="800px",
-            width="100%",
-            bgcolor="#2B2B2B",
-            font_color="#A9B7C6",
-            directed=True
-        )
-        
-        # Configure physics
-        net.set_options("""
-        {
-          "physics": {
-            "forceAtlas2Based": {
-              "gravitationalConstant": -80,
-              "centralGravity": 0.015,
-              "springLength": 150,
-              "springConstant": 0.08
-            },
-            "maxVelocity": 50,
-            "solver": "forceAtlas2Based",
-            "timestep": 0.35,
-            "stabilization": {"iterations": 200}
-          },
-          "nodes": {
-            "font": {
-              "size": 16,
-              "color": "#A9B7C6",
-              "face": "Consolas"
-            },
-            "borderWidth": 2,
-            "borderWidthSelected": 3
-          },
-          "edges": {
-            "arrows": {
-              "to": {
-                "enabled": true,
-                "scaleFactor": 1.2,
-                "type": "arrow"
-              }
-            },
-            "color": {
-              "inherit": false,
-              "color": "#6A9FE0",
-              "highlight": "#8FC34B",
-              "hover": "#FFC66D"
-            },
-            "width": 2,
-            "smooth": {
-              "type": "cubicBezier",
-              "forceDirection": "horizontal",
-              "roundness": 0.5
-            },
-            "selectionWidth": 3
-          },
-          "interaction": {
-            "hover": true,
-            "navigationButtons": true,
-            "keyboard": true
-          }
+        # Store AI explanations for JavaScript access (keyed by node id)
+        node_ids = _node_ids(graph)
+        explanations_js = {
+            str(node_ids[func_name]): explanation
+            for func_name, explanation in ai_explanations.items()
+            if explanation and func_name in node_ids
         }
-        """)
         
-        # Store AI explanations for JavaScript access
-        explanations_js = {}
+        # Written on every call - a cached page still needs its current payload
+        explanations_script = _write_explanations_script(output_path, explanations_js)
         
-        # Add nodes
-        for func_name, func_info in graph.nodes.items():
-            safe_name = sanitize_text(func_name)
-            safe_file = sanitize_text(os.path.basename(func_info.file))
-            
-            # Determine node color
-            if func_info.is_async:
-                color = "#6A8759"
-            elif func_info.is_method:
-                color = "#CC7832"
-            else:
-                color = "#9876AA"
-            
-            # Build clean tooltip (without AI explanation to avoid HTML rendering issues)
-            signature = sanitize_text(func_info.signature or "()")
-            doc_preview = sanitize_text((func_info.docstring or "").strip().replace('\n', ' '))
-            if len(doc_preview) > 150:
-                doc_preview = doc_preview[:150] + "..."
-            
-            loc = func_info.loc or 0
-            callers = len(graph.get_callers(func_name))
-            callees = len(graph.get_callees(func_name))
-            
-            # Store AI explanation for modal
-            ai_explanation = ai_explanations.get(func_name, "")
-            if ai_explanation:
-                explanations_js[safe_name] = ai_explanation
-            
-            async_badge = "<span style='color:#6A8759;'>async</span>" if func_info.is_async else ""
-            class_line = (
-                f"<span style='color:#808080;'>Class:</span> {sanitize_text(func_info.class_name)}<br>"
-                if func_info.class_name else ""
-            )
-            
-            # Show AI indicator in tooltip if explanation exists
-            ai_indicator = ""
-            if ai_explanation:
-                ai_indicator = "<br><div style='margin-top:6px;padding:6px;background:#1E1E1E;border-left:3px solid #6A8759;border-radius:3px;'><small style='color:#6A8759;'>🤖 AI Explanation Available - Click to view</small></div>"
-            
-            tooltip = (
-                f"<div style='font-family:Consolas,monospace;font-size:12px;color:#A9B7C6;'>"
-                f"<strong style='color:#6A8759;'>{safe_name}{signature}</strong> {async_badge}<br>"
-                f"<span style='color:#808080;'>File:</span> {safe_file}:{func_info.line}<br>"
-                f"{class_line}"
-                f"<span style='color:#808080;'>Lines:</span> {loc} | "
-                f"<span style='color:#808080;'>Calls:</span> {callees} | "
-                f"<span style='color:#808080;'>Called by:</span> {callers}<br>"
-                f"<span style='color:#808080;'>Docstring:</span> {doc_preview or '—'}"
-                f"{ai_indicator}"
-                f"</div>"
-            )
-            
-            net.add_node(
-                safe_name,
-                label=safe_name,
-                title=tooltip,
-                color=color,
-                size=20 + len(graph.get_callers(func_name)) * 5
+        # Unchanged graph, explanations and settings: reuse the finished page
+        cache_key = None
+        if len(graph.nodes) > SMALL_GRAPH_NODES:
+            cache_key = self._render_key(
+                graph, "ai", explanations_script, tuple(explanations_js.items()),
+                stabilization_iterations, layout, tooltip, cluster
             )
+        if self._write_cached_page(cache_key, output_path):
+            print(f"AI-enhanced visualization saved to: {output_path}")
+            return str(output_path)
         
-        # Add edges
-        for from_func, to_funcs in graph.edges.items():
-            safe_from = sanitize_text(from_func)
-            for to_func in to_funcs:
-                safe_to = sanitize_text(to_func)
-                if safe_to in [sanitize_text(n) for n in graph.nodes.keys()]:
-                    net.add_edge(safe_from, safe_to)
+        def ai_node_meta(func_info, callers, callees):
+            has_explanation = str(node_ids.get(func_info.name)) in explanations_js
+            return self._ai_node_meta(func_info, callers, callees, has_explanation)
         
-        # Generate HTML
-        net.save_graph(str(output_path))
+        net, node_meta = self._build_network(graph, ai_node_meta, stabilization_iterations,
+                                             layout, tooltip)
         
-        # Enhance HTML with click handlers and AI modal
-        self._add_ai_modal(output_path, explanations_js, graph)
+        # Generate HTML with click handlers, AI modal and hover tooltips
+        html = _write_page(
+            net,
+            output_path,
+            body_end=self._add_ai_modal(explanations_script, graph).encode('utf-8')
+            + _node_tooltip_html(node_meta) + _cluster_html(cluster, len(graph.nodes))
+        )
+        self._cache_page(cache_key, html)
         
         print(f"AI-enhanced visualization saved to: {output_path}")
         return str(output_path)
     
-    def _add_ai_modal(self, html_path: Path, explanations: dict, graph: CallGraph):
-        """Add modal dialog for AI explanations on node click"""
+    def _add_ai_modal(self, explanations_script: str, graph: CallGraph) -> str:
+        """
+        Build the modal dialog for AI explanations on node click (inserted before </body>)
+        
+        Args:
+            explanations_script: Script file (see _write_explanations_script)
+                that defines window.aiExplanations, loaded on the first node click
+            graph: CallGraph being rendered
+        """
         try:
-            import json
-            
-            with open(html_path, 'r', encoding='utf-8') as f:
-                html = f.read()
-            
-            # Properly encode explanations as JSON
-            explanations_json = json.dumps(explanations)
+            # Used in a JS string literal - percent-encoding leaves no quotes or backslashes
+            script_src = quote(explanations_script)
             
             modal_html = f"""
             <style>
@@ -626,7 +1107,6 @@ class Visualizer:
             </div>
             
             <script>
-                const aiExplanations = {explanations_json};
                 const modal = document.getElementById('ai-modal');
                 const overlay = document.getElementById('ai-modal-overlay');
                 const modalBody = document.getElementById('ai-modal-body');
@@ -651,47 +1131,69 @@ class Visualizer:
                 closeBtn.onclick = closeModal;
                 overlay.onclick = closeModal;
                 
-                // Handle node clicks
-                network.on("click", function(params) {{
-                    if (params.nodes.length > 0) {{
-                        const nodeId = params.nodes[0];
-                        const explanation = aiExplanations[nodeId];
-                        
-                        if (explanation) {{
-                            // Escape HTML and format nicely
-                            const escapeHtml = (text) => {{
-                                const div = document.createElement('div');
-                                div.textContent = text;
-                                return div.innerHTML;
+                // Explanations are loaded from their script file on the first click
+                let explanationsRequest = null;
+                function withExplanations(callback) {{
+                    if (!explanationsRequest) {{
+                        explanationsRequest = new Promise(function (resolve) {{
+                            const script = document.createElement('script');
+                            script.src = '{script_src}';
+                            script.onload = script.onerror = function () {{
+                                resolve(window.aiExplanations || {{}});
                             }};
-                            
-                            const formattedExplanation = escapeHtml(explanation)
-                                .replace(/\\n\\n/g, '<br><br>')
-                                .replace(/\\n/g, '<br>');
-                            
-                            modalBody.innerHTML = `
-                                <div style="background:#1E1E1E;padding:25px;border-radius:10px;border-left:5px solid #6A8759;box-shadow:0 2px 10px rgba(0,0,0,0.3);">
-                                    <div style="margin-bottom:20px;">
-                                        <strong style="color:#6A8759;font-size:16px;display:block;margin-bottom:8px;">📌 Function:</strong> 
-                                        <code style="color:#FFC66D;font-size:16px;background:#2B2B2B;padding:8px 12px;border-radius:6px;display:inline-block;">${{escapeHtml(nodeId)}}</code>
-                                    </div>
-                                    <hr style="border:none;border-top:2px solid #3C3F41;margin:20px 0;">
-                                    <div style="color:#B8D4A8;line-height:1.8;font-size:15px;letter-spacing:0.3px;">
-                                        ${{formattedExplanation}}
-                                    </div>
+                            document.body.appendChild(script);
+                        }});
+                    }}
+                    explanationsRequest.then(callback);
+                }}
+                
+                function showExplanation(nodeId, explanation) {{
+                    const nodeName = nodes.get(nodeId).label;
+                    
+                    if (explanation) {{
+                        // Escape HTML and format nicely
+                        const escapeHtml = (text) => {{
+                            const div = document.createElement('div');
+                            div.textContent = text;
+                            return div.innerHTML;
+                        }};
+                        
+                        const formattedExplanation = escapeHtml(explanation)
+                            .replace(/\\n\\n/g, '<br><br>')
+                            .replace(/\\n/g, '<br>');
+                        
+                        modalBody.innerHTML = `
+                            <div style="background:#1E1E1E;padding:25px;border-radius:10px;border-left:5px solid #6A8759;box-shadow:0 2px 10px rgba(0,0,0,0.3);">
+                                <div style="margin-bottom:20px;">
+                                    <strong style="color:#6A8759;font-size:16px;display:block;margin-bottom:8px;">📌 Function:</strong> 
+                                    <code style="color:#FFC66D;font-size:16px;background:#2B2B2B;padding:8px 12px;border-radius:6px;display:inline-block;">${{escapeHtml(nodeName)}}</code>
                                 </div>
-                            `;
-                            showModal();
-                        }} else {{
-                            modalBody.innerHTML = `
-                                <div style="background:#3C3F41;padding:30px;border-radius:10px;text-align:center;">
-                                    <div style="font-size:48px;margin-bottom:15px;">⚠️</div>
-                                    <span style="color:#BBB529;font-size:18px;font-weight:500;">No AI explanation available</span><br><br>
-                                    <small style="color:#808080;font-size:14px;">AI explanations may not be generated for all functions.<br>Try re-running flow analysis with AI enabled.</small>
+                                <hr style="border:none;border-top:2px solid #3C3F41;margin:20px 0;">
+                                <div style="color:#B8D4A8;line-height:1.8;font-size:15px;letter-spacing:0.3px;">
+                                    ${{formattedExplanation}}
                                 </div>
-                            `;
-                            showModal();
-                        }}
+                            </div>
+                        `;
+                        showModal();
+                    }} else {{
+                        modalBody.innerHTML = `
+                            <div style="background:#3C3F41;padding:30px;border-radius:10px;text-align:center;">
+                                <div style="font-size:48px;margin-bottom:15px;">⚠️</div>
+                                <span style="color:#BBB529;font-size:18px;font-weight:500;">No AI explanation available</span><br><br>
+                                <small style="color:#808080;font-size:14px;">AI explanations may not be generated for all functions.<br>Try re-running flow analysis with AI enabled.</small>
+                            </div>
+                        `;
+                        showModal();
+                    }}
+                }}
+                
+                // Handle node clicks
+                network.on("click", function(params) {{
+                    if (params.nodes.length > 0 && !network.isCluster(params.nodes[0])) {{
+                        const nodeId = params.nodes[0];
+                        withExplanations(function (aiExplanations) {{
+                            showExplanation(nodeId, aiExplanations[nodeId]);
+                        }});
                     }}
                 }});
                 
@@ -704,13 +1206,11 @@ class Visualizer:
             </script>
             """
             
-            html = html.replace('</body>', modal_html + '</body>')
-            
-            with open(html_path, 'w', encoding='utf-8') as f:
-                f.write(html)
+            return modal_html
                 
         except Exception as e:
             print(f"Error adding AI modal: {e}")
+            return ""
     
     def render_with_trace_overlay(self, graph: CallGraph, trace_data: dict, 
                                    ai_explanations: dict = None,
@@ -734,18 +1234,7 @@ class Visualizer:
         trace_events = trace_data.get('events', [])
         
         # Calculate performance percentiles for color coding
-        all_avg_times = []
-        for func_name, stats in trace_stats.items():
-            if stats.get('call_count', 0) > 0:
-                avg_time = stats['total_time'] / stats['call_count']
-                all_avg_times.append(avg_time)
-        
-        all_avg_times.sort()
-        if all_avg_times:
-            p50 = all_avg_times[len(all_avg_times) // 2] if len(all_avg_times) > 0 else 0.001
-            p90 = all_avg_times[int(len(all_avg_times) * 0.9)] if len(all_avg_times) > 1 else 0.01
-        else:
-            p50, p90 = 0.001, 0.01
+        p50, p90 = _trace_percentiles(trace_stats)
         
         # Create PyVis network
         net = Network(
@@ -756,200 +1245,108 @@ class Visualizer:
             directed=True
         )
         
+        node_ids = _node_ids(graph)
+        edges = _edge_records(graph, node_ids)
+        
         # Configure physics
-        net.set_options("""
-        {
-          "physics": {
-            "forceAtlas2Based": {
-              "gravitationalConstant": -80,
-              "centralGravity": 0.015,
-              "springLength": 150,
-              "springConstant": 0.08
-            },
-            "maxVelocity": 50,
-            "solver": "forceAtlas2Based",
-            "timestep": 0.35,
-            "stabilization": {"iterations": 200}
-          },
-          "nodes": {
-            "font": {
-              "size": 16,
-              "color": "#A9B7C6",
-              "face": "Consolas"
-            },
-            "borderWidth": 3,
-            "borderWidthSelected": 4
-          },
-          "edges": {
-            "arrows": {
-              "to": {
-                "enabled": true,
-                "scaleFactor": 1.2,
-                "type": "arrow"
-              }
-            },
-            "color": {
-              "inherit": false,
-              "color": "#6A9FE0",
-              "highlight": "#8FC34B",
-              "hover": "#FFC66D"
-            },
-            "width": 2,
-            "smooth": {
-              "type": "cubicBezier",
-              "forceDirection": "horizontal",
-              "roundness": 0.5
-            }
-          },
-          "interaction": {
-            "hover": true,
-            "navigationButtons": true,
-            "keyboard": true
-          }
-        }
-        """)
+        net.options = _network_options(border_width=3, selection_width=None, node_count=len(graph.nodes),
+                                       edge_count=len(edges))
+        
+        caller_counts, callee_counts = self._call_counts(graph)
+        
+        # Trace figures and speed buckets, computed up front for executed functions
+        executed_stats = _executed_node_stats(graph, trace_stats, p50, p90)
+        not_executed = (0, 0, 0, 0, {})
+        # One vis.js color dict per speed bucket, shared by all nodes in it
+        bucket_colors = tuple({'background': color, 'border': border} for color, border in _TRACE_COLORS)
+        
+        # Node dicts are collected and loaded into the network in one go
+        nodes = []
+        node_meta = []
+        font = {"color": net.font_color}
         
         # Add nodes with performance-based coloring
         for func_name, func_info in graph.nodes.items():
-            safe_name = sanitize_text(func_name)
-            safe_file = sanitize_text(os.path.basename(func_info.file))
+            safe_name = _cached_sanitize(func_name)
+            bucket, call_count, total_time, avg_time, func_stats = executed_stats.get(func_name, not_executed)
             
-            # Get trace statistics for this function
-            func_stats = trace_stats.get(func_name, {})
-            call_count = func_stats.get('call_count', 0)
-            total_time = func_stats.get('total_time', 0)
-            avg_time = (total_time / call_count) if call_count > 0 else 0
-            
-            # Performance-based color coding
-            if call_count == 0:
-                # Not executed - gray
-                color = "#555555"
-                border_color = "#777777"
-            elif avg_time < p50:
-                # Fast - green
-                color = "#6A8759"
-                border_color = "#8FC34B"
-            elif avg_time < p90:
-                # Medium - orange
-                color = "#CC7832"
-                border_color = "#FFC66D"
-            else:
-                # Slow - red
-                color = "#BC3F3C"
-                border_color = "#FF6B6B"
-            
-            # Build enhanced tooltip with trace data
-            signature = sanitize_text(func_info.signature or "()")
-            doc_preview = sanitize_text((func_info.docstring or "").strip().replace('\n', ' '))
+            # Tooltip fields with trace data (the page builds the tooltip on hover)
+            doc_preview = (func_info.docstring or "").strip()
             if len(doc_preview) > 100:
                 doc_preview = doc_preview[:100] + "..."
+            meta = self._base_node_meta(func_info, caller_counts[func_name],
+                                        callee_counts[func_name], doc_preview)
             
-            # Performance metrics
-            perf_section = ""
-            if call_count > 0:
-                min_time = func_stats.get('min_time', 0) * 1000  # to ms
-                max_time = func_stats.get('max_time', 0) * 1000
-                avg_time_ms = avg_time * 1000
-                total_time_ms = total_time * 1000
-                
-                perf_section = f"""
-                <div style='margin-top:8px;padding:8px;background:#1E1E1E;border-left:3px solid {border_color};border-radius:3px;'>
-                    <strong style='color:{border_color};'>⚡ Execution Trace</strong><br>
-                    <span style='color:#808080;'>Calls:</span> <strong>{call_count}</strong><br>
-                    <span style='color:#808080;'>Total:</span> {total_time_ms:.2f}ms<br>
-                    <span style='color:#808080;'>Avg:</span> {avg_time_ms:.3f}ms<br>
-                    <span style='color:#808080;'>Min:</span> {min_time:.3f}ms | <span style='color:#808080;'>Max:</span> {max_time:.3f}ms
-                </div>
-                """
-            else:
-                perf_section = """
-                <div style='margin-top:8px;padding:8px;background:#1E1E1E;border-left:3px solid #555555;border-radius:3px;'>
-                    <span style='color:#808080;'>⚠️ Not executed in trace</span>
-                </div>
-                """
+            # Performance metrics (None: not executed)
+            meta["trace"] = {
+                "color": _TRACE_COLORS[bucket][1],
+                "calls": call_count,
+                "total": total_time * 1000,  # to ms
+                "avg": avg_time * 1000,
+                "min": func_stats.get('min_time', 0) * 1000,
+                "max": func_stats.get('max_time', 0) * 1000,
+            } if call_count > 0 else None
             
             # AI explanation indicator
-            ai_indicator = ""
             if ai_explanations and func_name in ai_explanations:
-                ai_indicator = "<br><small style='color:#6A8759;'>🤖 AI Explanation Available</small>"
-            
-            async_badge = "<span style='color:#6A8759;'>async</span>" if func_info.is_async else ""
-            class_line = (
-                f"<span style='color:#808080;'>Class:</span> {sanitize_text(func_info.class_name)}<br>"
-                if func_info.class_name else ""
-            )
-            
-            tooltip = (
-                f"<div style='font-family:Consolas,monospace;font-size:12px;color:#A9B7C6;'>"
-                f"<strong style='color:#6A8759;'>{safe_name}{signature}</strong> {async_badge}<br>"
-                f"<span style='color:#808080;'>File:</span> {safe_file}:{func_info.line}<br>"
-                f"{class_line}"
-                f"<span style='color:#808080;'>LOC:</span> {func_info.loc or 0}<br>"
-                f"<span style='color:#808080;'>Docstring:</span> {doc_preview or '—'}"
-                f"{perf_section}"
-                f"{ai_indicator}"
-                f"</div>"
-            )
+                meta["ai"] = 1
+            node_meta.append(meta)
             
             # Size based on call count (with minimum size)
             node_size = 20 + min(call_count * 2, 50)
             
-            net.add_node(
-                safe_name,
-                label=safe_name,
-                title=tooltip,
-                color={'background': color, 'border': border_color},
-                size=node_size,
-                borderWidth=3
-            )
+            nodes.append({
+                "id": node_ids[func_name],
+                "label": safe_name,
+                "shape": "dot",
+                "color": bucket_colors[bucket],  # Performance-based color coding
+                "size": node_size,
+                "borderWidth": 3,
+                "font": font
+            })
         
-        # Add edges (could enhance with execution frequency if needed)
-        for from_func, to_funcs in graph.edges.items():
-            safe_from = sanitize_text(from_func)
-            for to_func in to_funcs:
-                safe_to = sanitize_text(to_func)
-                if safe_to in [sanitize_text(n) for n in graph.nodes.keys()]:
-                    net.add_edge(safe_from, safe_to)
-        
-        # Generate HTML
-        net.save_graph(str(output_path))
+        # Add nodes and edges (could enhance edges with execution frequency if needed)
+        _load_network(net, nodes, edges)
         
         # Add trace overlay enhancements
-        self._add_trace_overlay_ui(output_path, trace_stats, trace_events)
+        overlay_html = self._add_trace_overlay_ui(trace_stats, trace_events)
         
         # Add AI modal if explanations provided
+        modal_html = ""
         if ai_explanations:
-            explanations_js = {sanitize_text(k): v for k, v in ai_explanations.items()}
-            self._add_ai_modal(output_path, explanations_js, graph)
+            explanations_js = {
+                str(node_ids[func_name]): explanation
+                for func_name, explanation in ai_explanations.items() if func_name in node_ids
+            }
+            explanations_script = _write_explanations_script(output_path, explanations_js)
+            modal_html = self._add_ai_modal(explanations_script, graph)
+        
+        # Generate HTML - both go into the page in a single scan
+        _write_page(net, output_path, body_start=overlay_html.encode('utf-8'),
+                    body_end=modal_html.encode('utf-8') + _node_tooltip_html(node_meta))
         
         print(f"Trace-enhanced visualization saved to: {output_path}")
         return str(output_path)
     
-    def _add_trace_overlay_ui(self, html_path: Path, stats: dict, events: list):
-        """Add trace statistics panel and legend to visualization"""
+    def _add_trace_overlay_ui(self, stats: dict, events: list) -> str:
+        """Build the trace statistics panel and legend (inserted after <body>)"""
         try:
-            import json
-            
-            with open(html_path, 'r', encoding='utf-8') as f:
-                html = f.read()
-            
             # Calculate totals
             total_calls = sum(s.get('call_count', 0) for s in stats.values())
             total_time = sum(s.get('total_time', 0) for s in stats.values()) * 1000  # to ms
             functions_executed = sum(1 for s in stats.values() if s.get('call_count', 0) > 0)
             
-            # Top 5 slowest functions
-            top_slow = sorted(
-                [(name, s) for name, s in stats.items() if s.get('call_count', 0) > 0],
-                key=lambda x: x[1]['total_time'],
-                reverse=True
-            )[:5]
+            # Top 5 slowest functions (selected without sorting them all)
+            top_slow = heapq.nlargest(
+                5,
+                ((name, s) for name, s in stats.items() if s.get('call_count', 0) > 0),
+                key=lambda x: x[1]['total_time']
+            )
             
-            top_slow_html = ""
-            for func_name, func_stats in top_slow:
-                time_ms = func_stats['total_time'] * 1000
-                calls = func_stats['call_count']
-                top_slow_html += f"<div style='padding:4px;margin:2px 0;background:#1E1E1E;border-radius:3px;'><small>{sanitize_text(func_name)[:25]}: {time_ms:.1f}ms ({calls} calls)</small></div>"
+            top_slow_html = "".join(
+                f"<div style='padding:4px;margin:2px 0;background:#1E1E1E;border-radius:3px;'><small>{sanitize_text(func_name)[:25]}: {func_stats['total_time'] * 1000:.1f}ms ({func_stats['call_count']} calls)</small></div>"
+                for func_name, func_stats in top_slow
+            )
             
             overlay_html = f"""
             <div id="trace-stats-panel" style="
@@ -1005,10 +1402,8 @@ class Visualizer:
             </div>
             """
             
-            html = html.replace('<body>', '<body>' + overlay_html)
-            
-            with open(html_path, 'w', encoding='utf-8') as f:
-                f.write(html)
+            return overlay_html
                 
         except Exception as e:
             print(f"Error adding trace overlay UI: {e}")
+            return ""
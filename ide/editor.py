@@ -4,9 +4,17 @@ Code Editor Widget with syntax highlighting, line numbers, and IntelliSense
 from PyQt5.QtWidgets import QPlainTextEdit, QWidget, QTextEdit, QCompleter
 from PyQt5.QtGui import (QFont, QColor, QPainter, QTextCharFormat, 
                         QSyntaxHighlighter, QTextCursor, QKeyEvent, QTextFormat)
-from PyQt5.QtCore import Qt, QRect, QSize, QRegExp, QTimer, QStringListModel
+from PyQt5.QtCore import Qt, QRect, QSize, QRegExp, QTimer, QStringListModel, QEvent
 import jedi
 
+from ide.utils.workers import CodeAnalysisWorker
+
+# Buffers larger than this get no autocomplete (Jedi would take seconds)
+MAX_COMPLETION_CHARS = 200_000
+
+# Completion popups list at most this many names (typing narrows the next request)
+MAX_COMPLETION_ITEMS = 50
+
 
 class LineNumberArea(QWidget):
     """Line number widget for code editor"""
@@ -37,9 +45,9 @@ class PythonHighlighter(QSyntaxHighlighter):
                    "True", "False", "None", "and", "or", "not", "in", "is", "lambda",
                    "yield", "break", "continue", "pass", "raise", "assert", "del",
                    "global", "nonlocal", "async", "await"]
-        for word in keywords:
-            pattern = QRegExp(f"\\b{word}\\b")
-            self.highlightingRules.append((pattern, keywordFormat))
+        # One alternation per word list: a single scan of the block instead of one per word
+        pattern = QRegExp("\\b(" + "|".join(keywords) + ")\\b")
+        self.highlightingRules.append((pattern, keywordFormat))
         
         # Built-in functions
         builtinFormat = QTextCharFormat()
@@ -47,15 +55,15 @@ class PythonHighlighter(QSyntaxHighlighter):
         builtins = ["print", "len", "range", "str", "int", "float", "list", "dict",
                    "set", "tuple", "open", "input", "type", "isinstance", "enumerate",
                    "zip", "map", "filter", "sum", "max", "min", "abs", "all", "any"]
-        for word in builtins:
-            pattern = QRegExp(f"\\b{word}\\b")
-            self.highlightingRules.append((pattern, builtinFormat))
+        pattern = QRegExp("\\b(" + "|".join(builtins) + ")\\b")
+        self.highlightingRules.append((pattern, builtinFormat))
         
         # Strings
         stringFormat = QTextCharFormat()
         stringFormat.setForeground(QColor(106, 135, 89))
-        self.highlightingRules.append((QRegExp("\".*\""), stringFormat))
-        self.highlightingRules.append((QRegExp("'.*'"), stringFormat))
+        # Each literal ends at its own closing quote (escapes skipped), not the last on the line
+        self.highlightingRules.append((QRegExp(r'"(?:[^"\\]|\\.)*"'), stringFormat))
+        self.highlightingRules.append((QRegExp(r"'(?:[^'\\]|\\.)*'"), stringFormat))
         
         # Comments
         commentFormat = QTextCharFormat()
@@ -65,11 +73,11 @@ class PythonHighlighter(QSyntaxHighlighter):
         # Numbers
         numberFormat = QTextCharFormat()
         numberFormat.setForeground(QColor(104, 151, 187))
-        self.highlightingRules.append((QRegExp("\\b[0-9]+\\b"), numberFormat))
+        self.highlightingRules.append((QRegExp(r"\b\d+(?:\.\d+)?(?:[eE][+-]?\d+)?\b"), numberFormat))
 
     def highlightBlock(self, text):
-        for pattern, format in self.highlightingRules:
-            expression = QRegExp(pattern)
+        # Rules hold compiled QRegExp objects - reuse them instead of copying per block
+        for expression, format in self.highlightingRules:
             index = expression.indexIn(text)
             while index >= 0:
                 length = expression.matchedLength()
@@ -83,24 +91,79 @@ class LintHighlighter(QSyntaxHighlighter):
     def __init__(self, document):
         super().__init__(document)
         self.errors = []
+        self._errors_by_line = {}
+        # Underlined blocks keyed by their block number when last highlighted
+        # (one entry per block) - QTextBlock handles follow their text when
+        # lines are inserted or removed
+        self._underlined_blocks = {}
+        # Set when a moved underlined block lost its entry to another block
+        self._untracked_underlines = False
+        self._block_count = document.blockCount()
+        
+        # One shared underline format for every error
+        self._error_format = QTextCharFormat()
+        self._error_format.setUnderlineColor(QColor("#FF5555"))
+        self._error_format.setUnderlineStyle(QTextCharFormat.SpellCheckUnderline)
 
     def set_errors(self, errors):
+        document = self.document()
+        block_count = document.blockCount()
+        if (errors == self.errors and block_count == self._block_count
+                and not self._untracked_underlines
+                and all(block.isValid() and block.blockNumber() == number
+                        for number, block in self._underlined_blocks.items())):
+            return
+        
         self.errors = errors
-        self.rehighlight()
+        self._errors_by_line = {}
+        for err in errors:
+            self._errors_by_line.setdefault(err.get("line", 0), []).append(err)
+        underlined_blocks = self._underlined_blocks.values()
+        self._underlined_blocks = {}
+        
+        if block_count != self._block_count or self._untracked_underlines:
+            # Lines were inserted or removed: line numbers no longer match the
+            # blocks that carry underlines, so repaint everything once
+            self._block_count = block_count
+            self._untracked_underlines = False
+            self.rehighlight()
+            return
+        
+        # Otherwise only the blocks that carried an underline and the new
+        # error lines need repainting, not the whole document
+        for block in underlined_blocks:
+            if block.isValid():
+                self.rehighlightBlock(block)
+        for line in self._errors_by_line:
+            block = document.findBlockByNumber(line - 1)
+            if block.isValid():
+                self.rehighlightBlock(block)
 
     def highlightBlock(self, text):
-        for err in self.errors:
-            if self.currentBlock().blockNumber() + 1 == err.get("line", 0):
-                fmt = QTextCharFormat()
-                fmt.setUnderlineColor(QColor("#FF5555"))
-                fmt.setUnderlineStyle(QTextCharFormat.SpellCheckUnderline)
-                col = err.get("column", 0)
-                self.setFormat(col, len(text) - col, fmt)
+        # Errors are indexed by line, so blocks without errors cost one lookup
+        block = self.currentBlock()
+        block_number = block.blockNumber()
+        errors = self._errors_by_line.get(block_number + 1)
+        if not errors:
+            return
+        previous = self._underlined_blocks.get(block_number)
+        if previous is not None and previous != block:
+            self._untracked_underlines = True
+        self._underlined_blocks[block_number] = block
+        for err in errors:
+            col = err.get("column", 0)
+            self.setFormat(col, len(text) - col, self._error_format)
 
 
 class CodeEditor(QPlainTextEdit):
     """Advanced code editor with line numbers, autocomplete, and linting"""
     
+    # Running completion threads, kept alive even if their editor is closed first
+    _live_completion_workers = set()
+    
+    # Advance of a digit in the current font (None until measured)
+    _digit_width = None
+    
     def __init__(self, parent_ide=None):
         super().__init__()
         self.parent_ide = parent_ide
@@ -114,8 +177,13 @@ class CodeEditor(QPlainTextEdit):
         self.updateLineNumberAreaWidth(0)
         self.highlightCurrentLine()
         
-        # Autocomplete
+        # Autocomplete (Jedi runs on a worker thread, one request at a time)
         self.completer = None
+        self._completion_worker = None
+        self._completion_pending = False
+        self._completion_position = -1
+        self._jedi_project_cache = None
+        self._jedi_script = None  # (code, path, jedi.Script) of the last completion
         self.autocomplete_timer = QTimer()
         self.autocomplete_timer.setSingleShot(True)
         self.autocomplete_timer.timeout.connect(self.show_autocomplete)
@@ -132,10 +200,19 @@ class CodeEditor(QPlainTextEdit):
         """)
     
     def lineNumberAreaWidth(self):
+        # Font metrics are only queried again after a font change
+        if self._digit_width is None:
+            self._digit_width = self.fontMetrics().horizontalAdvance('9')
         digits = len(str(max(1, self.blockCount())))
-        space = 10 + self.fontMetrics().horizontalAdvance('9') * digits
+        space = 10 + self._digit_width * digits
         return space
 
+    def changeEvent(self, event):
+        if event.type() == QEvent.FontChange:
+            self._digit_width = None
+            self.updateLineNumberAreaWidth(0)
+        super().changeEvent(event)
+
     def updateLineNumberAreaWidth(self, _):
         self.setViewportMargins(self.lineNumberAreaWidth(), 0, 0, 0)
 
@@ -192,24 +269,73 @@ class CodeEditor(QPlainTextEdit):
             self.autocomplete_timer.start(150)
     
     def show_autocomplete(self):
-        """Show autocomplete suggestions using Jedi"""
+        """Request autocomplete suggestions from Jedi on a worker thread"""
+        if self._completion_worker is not None:
+            # A Jedi call cannot be interrupted - rerun with the current text once it ends
+            self._completion_pending = True
+            return
+        
         cursor = self.textCursor()
         code = self.toPlainText()
+        if len(code) > MAX_COMPLETION_CHARS:
+            return
         line = cursor.blockNumber() + 1
         column = cursor.positionInBlock()
         
+        # Unchanged buffer (e.g. only the cursor moved): reuse the parsed script
+        path = self._file_path()
+        script = None
+        if self._jedi_script is not None and self._jedi_script[:2] == (code, path):
+            script = self._jedi_script[2]
+        
+        worker = CodeAnalysisWorker(code, line, column, self._jedi_project(), path, script)
+        worker.completions_ready.connect(self._on_completions_ready)
+        worker.finished.connect(self._on_completion_finished)
+        worker.finished.connect(lambda: CodeEditor._live_completion_workers.discard(worker))
+        CodeEditor._live_completion_workers.add(worker)
+        self._completion_worker = worker
+        self._completion_position = cursor.position()
+        worker.start()
+    
+    def _file_path(self):
+        """Path of the file open in this editor, None for unsaved buffers"""
+        ide = self.parent_ide
+        open_files = getattr(ide, "open_files", None)
+        if not open_files:
+            return None
+        return open_files.get(ide.tab_widget.indexOf(self))
+    
+    def _jedi_project(self):
+        """jedi.Project for the IDE's project folder, reused while the folder is unchanged"""
+        project_dir = getattr(self.parent_ide, "project_dir", None)
+        if not project_dir:
+            return None
+        cached = self._jedi_project_cache
+        if cached is None or cached[0] != project_dir:
+            try:
+                cached = (project_dir, jedi.Project(project_dir))
+            except Exception:
+                cached = (project_dir, None)
+            self._jedi_project_cache = cached
+        return cached[1]
+    
+    def _on_completions_ready(self, names):
+        """Show completions unless the text or cursor changed since they were requested"""
+        if self._completion_pending or self.textCursor().position() != self._completion_position:
+            return
+        words = [name for name in names if name][:MAX_COMPLETION_ITEMS]
+        
         try:
-            script = jedi.Script(code)
-            completions = script.complete(line, column)
-            words = [c.name for c in completions if c.name]
-            
             if words:
                 if not self.completer:
                     self.completer = QCompleter(self)
                     self.completer.setWidget(self)
                     self.completer.setCaseSensitivity(Qt.CaseInsensitive)
                     self.completer.setCompletionMode(QCompleter.PopupCompletion)
+                    self.completer.setMaxVisibleItems(10)
                     self.completer.activated.connect(self.insert_completion)
+                    # Rows share one height, so the popup's size hint is not measured row by row
+                    self.completer.popup().setUniformItemSizes(True)
                 
                 model = QStringListModel(words)
                 self.completer.setModel(model)
@@ -222,6 +348,16 @@ class CodeEditor(QPlainTextEdit):
         except Exception:
             pass
     
+    def _on_completion_finished(self):
+        """Release the finished worker and run the request that arrived meanwhile"""
+        worker = self._completion_worker
+        if worker.script is not None:
+            self._jedi_script = (worker.code, worker.path, worker.script)
+        self._completion_worker = None
+        if self._completion_pending:
+            self._completion_pending = False
+            self.show_autocomplete()
+    
     def insert_completion(self, completion):
         """Insert selected completion"""
         cursor = self.textCursor()
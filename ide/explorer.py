@@ -1,7 +1,7 @@
 """
 File Explorer Widget
 """
-from PyQt5.QtWidgets import QTreeView, QFileSystemModel, QMenu, QAction, QInputDialog, QMessageBox
+from PyQt5.QtWidgets import QTreeView, QFileSystemModel, QMenu, QInputDialog, QMessageBox
 from PyQt5.QtCore import Qt, QDir
 import os
 import shutil
@@ -10,6 +10,20 @@ import shutil
 class FileExplorer(QTreeView):
     """File explorer with context menu and file operations"""
     
+    _MENU_STYLESHEET = """
+        QMenu {
+            background-color: #3C3F41;
+            color: #BBBBBB;
+            border: 1px solid #555555;
+        }
+        QMenu::item {
+            padding: 5px 30px;
+        }
+        QMenu::item:selected {
+            background-color: #4B6EAF;
+        }
+    """
+    
     def __init__(self, project_dir, parent_ide=None):
         super().__init__()
         self.parent_ide = parent_ide
@@ -19,6 +33,12 @@ class FileExplorer(QTreeView):
         self.model = QFileSystemModel()
         self.model.setRootPath(self.project_dir)
         self.model.setFilter(QDir.AllEntries | QDir.NoDotAndDotDot)
+        # File operations go through os/shutil; the model only mirrors disk
+        # and keeps itself current via its QFileSystemWatcher
+        self.model.setReadOnly(True)
+        self.model.setOption(QFileSystemModel.DontWatchForChanges, False)
+        # Stock folder icons only - skips reading per-directory icon settings
+        self.model.setOption(QFileSystemModel.DontUseCustomDirectoryIcons, True)
         
         # Setup view
         self.setModel(self.model)
@@ -30,7 +50,9 @@ class FileExplorer(QTreeView):
         for i in range(1, self.model.columnCount()):
             self.hideColumn(i)
         
-        # Context menu
+        # Context menu (one long-lived menu, so its stylesheet is parsed once)
+        self.context_menu = QMenu(self)
+        self.context_menu.setStyleSheet(self._MENU_STYLESHEET)
         self.setContextMenuPolicy(Qt.CustomContextMenu)
         self.customContextMenuRequested.connect(self.show_context_menu)
         
@@ -66,40 +88,26 @@ class FileExplorer(QTreeView):
     
     def show_context_menu(self, position):
         """Show context menu on right-click"""
-        menu = QMenu()
-        menu.setStyleSheet("""
-            QMenu {
-                background-color: #3C3F41;
-                color: #BBBBBB;
-                border: 1px solid #555555;
-            }
-            QMenu::item {
-                padding: 5px 30px;
-            }
-            QMenu::item:selected {
-                background-color: #4B6EAF;
-            }
-        """)
+        # Actions are owned by the menu, so clear() frees the previous ones
+        menu = self.context_menu
+        menu.clear()
         
         index = self.indexAt(position)
         
         # New Python File action
-        new_py_action = QAction("New Python File", self)
+        new_py_action = menu.addAction("New Python File")
         new_py_action.triggered.connect(self.new_python_file)
-        menu.addAction(new_py_action)
         
         menu.addSeparator()
         
         # Delete action (only if item is selected)
         if index.isValid():
-            delete_action = QAction("Delete", self)
+            delete_action = menu.addAction("Delete")
             delete_action.triggered.connect(lambda: self.delete_file(index))
-            menu.addAction(delete_action)
         
         # Refresh action
-        refresh_action = QAction("Refresh", self)
+        refresh_action = menu.addAction("Refresh")
         refresh_action.triggered.connect(self.refresh_tree)
-        menu.addAction(refresh_action)
         
         menu.exec_(self.viewport().mapToGlobal(position))
     
@@ -133,8 +141,6 @@ class FileExplorer(QTreeView):
                     self.parent_ide.open_file_by_path(filepath)
                     self.parent_ide.statusBar().showMessage(f"Created {filename}")
                 
-                self.refresh_tree()
-                
             except Exception as e:
                 QMessageBox.warning(self, "Error", f"Could not create file: {str(e)}")
     
@@ -161,13 +167,13 @@ class FileExplorer(QTreeView):
                 if self.parent_ide:
                     self.parent_ide.statusBar().showMessage(f"Deleted {filename}")
                 
-                self.refresh_tree()
-                
             except Exception as e:
                 QMessageBox.warning(self, "Error", f"Could not delete: {str(e)}")
     
     def refresh_tree(self):
-        """Refresh the file tree"""
+        """Re-read the file tree from disk (the user's Refresh action)"""
+        # Files created/deleted here are picked up by the model's watcher; this
+        # forced re-read is for changes it misses (network drives, watch limits)
         self.model.setRootPath("")
         self.model.setRootPath(self.project_dir)
         self.setRootIndex(self.model.index(self.project_dir))
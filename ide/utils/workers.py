@@ -85,17 +85,21 @@ class CodeAnalysisWorker(QThread):
     
     completions_ready = pyqtSignal(list)  # List of completion suggestions
     
-    def __init__(self, code, line, column):
+    def __init__(self, code, line, column, project=None, path=None, script=None):
         super().__init__()
         self.code = code
         self.line = line
         self.column = column
+        self.project = project  # Shared jedi.Project, keeps Jedi's caches warm
+        self.path = path  # With a path, parso re-parses only the changed part of the file
+        self.script = script  # jedi.Script already built for this exact code, if any
     
     def run(self):
         try:
             import jedi
-            script = jedi.Script(self.code)
-            completions = script.complete(self.line, self.column)
+            if self.script is None:
+                self.script = jedi.Script(self.code, path=self.path, project=self.project)
+            completions = self.script.complete(self.line, self.column)
             results = [c.name for c in completions]
             self.completions_ready.emit(results)
         except Exception:
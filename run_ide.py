@@ -1,5 +1,6 @@
 import sys
 import os
+import multiprocessing
 
 # Debug: Print Python interpreter being used
 print(f"Python executable: {sys.executable}")
@@ -9,4 +10,6 @@ print(f"sys.path: {sys.path[:3]}")  # First 3 paths
 from ide.main import main
 
 if __name__ == "__main__":
+    # Required for the flow analyzer's worker processes in frozen builds
+    multiprocessing.freeze_support()
     main()
@@ -2,17 +2,24 @@
 Comprehensive Test Suite
 Tests for analyzer, secret manager, AI manager, and chat panel
 """
+import ast
 import unittest
 import tempfile
 import os
 import json
 import shutil
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
 from unittest.mock import Mock, patch, MagicMock
+from collections import OrderedDict
 from pathlib import Path
 
 # Test imports
-from ide.analyzer.flow_analyzer import FunctionFlowAnalyzer, FunctionInfo
-from ide.analyzer.graph_builder import GraphBuilder
+from ide.analyzer.flow_analyzer import FunctionCallVisitor, FunctionFlowAnalyzer, FunctionInfo
+from ide.analyzer.graph_builder import CallGraph, GraphBuilder
+from ide.analyzer import flow_analyzer, graph_builder, visualizer
+from ide.analyzer import security
+from ide.analyzer.security import SecurityValidator, get_safe_file_entries, is_safe_path
 from ide.utils.secret_manager import SecretManager
 from ide.utils.settings import SettingsManager
 from ide.utils.ai_manager import (
@@ -20,6 +27,13 @@ from ide.utils.ai_manager import (
     RequestCache, RateLimiter
 )
 
+try:
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtGui import QTextDocument, QTextCursor
+    from ide.editor import LintHighlighter
+except ImportError:
+    LintHighlighter = None
+
 
 class TestFunctionFlowAnalyzer(unittest.TestCase):
     """Test function flow analyzer"""
@@ -124,6 +138,138 @@ def callee2():
         self.assertEqual(len(caller.calls), 2)
         self.assertIn("callee1", caller.calls)
         self.assertIn("callee2", caller.calls)
+    
+    def test_skip_files_over_max_file_bytes(self):
+        """Test files above max_file_bytes are not analyzed"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            Path(tmpdir, "small.py").write_text("def small():\n    pass\n")
+            Path(tmpdir, "large.py").write_text("def large():\n    pass\n" + "x = 1\n" * 100)
+            
+            analyzer = FunctionFlowAnalyzer(max_file_bytes=200)
+            functions = analyzer.analyze_project(tmpdir)
+            
+            self.assertEqual(set(functions), {"small"})
+            self.assertIsNone(analyzer._get_accepted_size(str(Path(tmpdir, "large.py"))))
+    
+    def test_skip_unreadable_file(self):
+        """Test a file whose size cannot be read is skipped, not analyzed"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir, "module.py")
+            path.write_text(self.test_code)
+            # Validation passes, so only the size check can reject the file
+            self.analyzer.security_validator = Mock()
+            self.analyzer.security_validator.validate_file.return_value = (True, "")
+            
+            self.assertIsNone(self.analyzer._get_accepted_size(str(Path(tmpdir, "missing.py"))))
+            with patch("os.path.getsize", side_effect=PermissionError("denied")):
+                self.assertEqual(self.analyzer.analyze_file(str(path)), {})
+
+    
+    def _visit(self, **flags):
+        """Run the visitor over test_code and build its call graph"""
+        visitor = FunctionCallVisitor("test.py", self.test_code, **flags)
+        visitor.visit(ast.parse(self.test_code))
+        graph = CallGraph()
+        for func_info in visitor.functions.values():
+            graph.add_function(func_info)
+        return visitor.functions, graph
+    
+    def test_capture_source_disabled(self):
+        """Test capture_source=False drops text fields but keeps the call graph"""
+        full, full_graph = self._visit()
+        bare, bare_graph = self._visit(capture_source=False)
+        
+        self.assertEqual(set(bare), set(full))
+        self.assertEqual(dict(bare_graph.edges), dict(full_graph.edges))
+        for name, info in bare.items():
+            self.assertEqual((info.signature, info.parameters, info.docstring, info.source),
+                             ("", [], "", ""))
+            self.assertEqual((info.line, info.loc, info.class_name),
+                             (full[name].line, full[name].loc, full[name].class_name))
+        self.assertEqual(full["func_a"].docstring, "Function A")
+        self.assertTrue(full["func_a"].source)
+    
+    def test_include_docstrings_disabled(self):
+        """Test include_docstrings=False only empties docstrings"""
+        full, full_graph = self._visit()
+        no_docs, no_docs_graph = self._visit(include_docstrings=False)
+        
+        self.assertEqual(dict(no_docs_graph.edges), dict(full_graph.edges))
+        for name, info in no_docs.items():
+            self.assertEqual(info.docstring, "")
+            self.assertEqual((info.signature, info.parameters, info.source, info.calls),
+                             (full[name].signature, full[name].parameters,
+                              full[name].source, full[name].calls))
+
+
+class _BrokenPool:
+    """Parse pool stand-in whose workers have died"""
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+    
+    def submit(self, *args, **kwargs):
+        future = Future()
+        future.set_exception(BrokenProcessPool("worker died"))
+        return future
+
+
+class TestProjectAnalysis(unittest.TestCase):
+    """Test the hash/parse pipeline of analyze_project"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.project = tempfile.mkdtemp()
+        # Enough files for the process pool to be used when enabled
+        for i in range(FunctionFlowAnalyzer.MIN_FILES_FOR_PROCESSES + 2):
+            with open(os.path.join(self.project, f"mod{i}.py"), "w") as f:
+                f.write(f"def f{i}(x=1):\n    \"\"\"Doc {i}\"\"\"\n    return g{i}(x)\n\n"
+                        f"def g{i}(x):\n    return len([x])\n")
+    
+    def tearDown(self):
+        """Clean up"""
+        shutil.rmtree(self.project)
+    
+    @staticmethod
+    def _summary(functions):
+        """Comparable view of analysis results"""
+        return {name: (info.line, sorted(info.calls), info.signature, info.docstring)
+                for name, info in functions.items()}
+    
+    def test_cache_hit_on_second_run(self):
+        """Test unchanged files are not parsed again"""
+        analyzer = FunctionFlowAnalyzer()
+        first = analyzer.analyze_project(self.project)
+        
+        with patch.object(flow_analyzer, "_parse_source") as parse:
+            second = analyzer.analyze_project(self.project)
+        
+        parse.assert_not_called()
+        self.assertEqual(self._summary(second), self._summary(first))
+        self.assertEqual(len(first), 2 * (FunctionFlowAnalyzer.MIN_FILES_FOR_PROCESSES + 2))
+    
+    def test_process_pool_matches_threads(self):
+        """Test parsing in worker processes gives the same result as threads"""
+        threaded = FunctionFlowAnalyzer().analyze_project(self.project)
+        with patch.object(flow_analyzer, "ProcessPoolExecutor",
+                          wraps=flow_analyzer.ProcessPoolExecutor) as process_pool:
+            processes = FunctionFlowAnalyzer(use_processes=True).analyze_project(self.project)
+        
+        process_pool.assert_called_once()
+        self.assertEqual(self._summary(processes), self._summary(threaded))
+    
+    def test_broken_process_pool_fallback(self):
+        """Test files are parsed in-process when the worker pool breaks"""
+        expected = FunctionFlowAnalyzer().analyze_project(self.project)
+        analyzer = FunctionFlowAnalyzer(use_processes=True)
+        
+        with patch.object(analyzer, "_create_parse_pool", return_value=_BrokenPool()):
+            functions = analyzer.analyze_project(self.project)
+        
+        self.assertEqual(self._summary(functions), self._summary(expected))
 
 
 class TestGraphBuilder(unittest.TestCase):
@@ -196,6 +342,354 @@ class TestGraphBuilder(unittest.TestCase):
         self.assertGreater(stats["total_functions"], 0)
 
 
+class TestCallGraph(unittest.TestCase):
+    """Test call graph algorithms"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.graph = CallGraph()
+    
+    def test_find_cycles_overlapping(self):
+        """Test every elementary cycle is reported once"""
+        # a -> b -> a, a -> b -> c -> a, plus self-recursive d
+        for src, dst in [("a", "b"), ("b", "a"), ("b", "c"), ("c", "a"), ("d", "d"), ("c", "print")]:
+            self.graph.add_edge(src, dst)
+        
+        cycles = self.graph.find_cycles()
+        
+        self.assertEqual(len(cycles), 3)
+        for cycle in cycles:
+            self.assertEqual(cycle[0], cycle[-1])
+        self.assertIn(["d", "d"], cycles)
+        self.assertEqual(sorted(len(c) for c in cycles), [2, 3, 4])
+    
+    def test_find_cycles_deep_chain(self):
+        """Test long cycles do not hit the recursion limit"""
+        for i in range(5000):
+            self.graph.add_edge(f"f{i}", f"f{i + 1}")
+        self.graph.add_edge("f5000", "f0")
+        
+        cycles = self.graph.find_cycles()
+        
+        self.assertEqual(len(cycles), 1)
+        self.assertEqual(len(cycles[0]), 5002)
+    
+    def test_find_cycles_limit(self):
+        """Test cycle enumeration stops at max_cycles"""
+        nodes = [f"f{i}" for i in range(6)]
+        for src in nodes:
+            for dst in nodes:
+                if src != dst:
+                    self.graph.add_edge(src, dst)
+        
+        self.assertEqual(len(self.graph.find_cycles(max_cycles=10)), 10)
+    
+    def test_save_to_json_round_trip(self):
+        """Test the streamed JSON file loads back into the same graph"""
+        self.graph.add_function(FunctionInfo(
+            name="Shape.área", file="shapes.py", line=3, calls={"helper", "print"},
+            is_method=True, class_name="Shape"
+        ))
+        self.graph.add_function(FunctionInfo(name="helper", file="shapes.py", line=9,
+                                             calls=set(), is_async=True))
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        
+        # Both encoders (orjson when installed, json otherwise)
+        for encoder in (graph_builder.orjson, None):
+            path = os.path.join(temp_dir, "graph.json")
+            with patch.object(graph_builder, "orjson", encoder):
+                self.graph.save_to_json(path)
+            
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(json.load(f), json.loads(json.dumps(self.graph.to_dict())))
+            loaded = CallGraph.load_from_json(path)
+            self.assertEqual(set(loaded.nodes), {"Shape.área", "helper"})
+            self.assertEqual(loaded.edges["Shape.área"], {"helper", "print"})
+            self.assertTrue(loaded.nodes["helper"].is_async)
+            self.assertEqual(loaded.nodes["Shape.área"].class_name, "Shape")
+
+
+class TestSecurity(unittest.TestCase):
+    """Test project containment and the safe file scan"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.project = os.path.join(self.temp_dir, "project")
+        self.outside = os.path.join(self.temp_dir, "outside")
+        os.makedirs(self.project)
+        os.makedirs(self.outside)
+    
+    def tearDown(self):
+        """Clean up"""
+        shutil.rmtree(self.temp_dir)
+    
+    def _write(self, path, text="def f():\n    pass\n"):
+        """Create a file (and its directories)"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+    
+    def _symlink(self, target, link):
+        """Create a symlink, skipping the test where that is not allowed"""
+        try:
+            os.symlink(target, link)
+        except (OSError, NotImplementedError):
+            self.skipTest("symlinks not supported")
+    
+    def test_validate_file_rejects_symlink_escape(self):
+        """Test a link inside the project pointing outside it is rejected"""
+        inside = self._write(os.path.join(self.project, "ok.py"))
+        link = os.path.join(self.project, "link.py")
+        self._symlink(self._write(os.path.join(self.outside, "secret.py")), link)
+        validator = SecurityValidator(self.project)
+        
+        self.assertTrue(validator.validate_file(inside)[0])
+        self.assertFalse(validator.validate_file(link)[0])
+        self.assertFalse(is_safe_path(self.project, link))
+        self.assertFalse(is_safe_path(self.project, self.project + "2"))
+    
+    def _scan(self, **kwargs):
+        """Relative paths found by get_safe_file_entries"""
+        return sorted(os.path.relpath(path, self.project)
+                      for path, _ in get_safe_file_entries(self.project, **kwargs))
+    
+    def test_scan_skips_symlinks(self):
+        """Test symlinked files and directories are not followed"""
+        self._write(os.path.join(self.project, "ok.py"))
+        self._symlink(self._write(os.path.join(self.outside, "secret.py")),
+                      os.path.join(self.project, "link.py"))
+        self._symlink(self.outside, os.path.join(self.project, "linked_dir"))
+        
+        self.assertEqual(self._scan(), ["ok.py"])
+    
+    def test_scan_prunes_ignored_dirs(self):
+        """Test IGNORED_DIRS and non-Python files are skipped"""
+        self._write(os.path.join(self.project, "pkg", "mod.py"))
+        self._write(os.path.join(self.project, "notes.txt"))
+        for ignored in ("__pycache__", ".git", "venv", "node_modules"):
+            self._write(os.path.join(self.project, ignored, "skip.py"))
+        
+        self.assertEqual(self._scan(), [os.path.join("pkg", "mod.py")])
+    
+    def test_scan_max_files(self):
+        """Test the scan stops at exactly max_files, sequential and parallel stat"""
+        for i in range(10):
+            self._write(os.path.join(self.project, f"d{i % 3}", f"m{i}.py"))
+        
+        self.assertEqual(len(self._scan(max_files=4)), 4)
+        with patch.object(security, "PARALLEL_STAT_MIN_FILES", 1):
+            self.assertEqual(len(self._scan(max_files=4)), 4)
+            self.assertEqual(len(self._scan()), 10)
+    
+    def test_scan_size_filter(self):
+        """Test files over MAX_FILE_SIZE are dropped and stat results returned"""
+        self._write(os.path.join(self.project, "small.py"), "x = 1\n")
+        self._write(os.path.join(self.project, "big.py"), "x = 1\n" * 100)
+        
+        with patch.object(security, "MAX_FILE_SIZE", 100):
+            entries = get_safe_file_entries(self.project)
+            self.assertEqual([os.path.basename(path) for path, _ in entries], ["small.py"])
+            self.assertEqual(entries[0][1].st_size, 6)
+            
+            validator = SecurityValidator(self.project)
+            big = os.path.join(self.project, "big.py")
+            self.assertTrue(validator.validate_stat(*entries[0])[0])
+            self.assertFalse(validator.validate_stat(big, os.stat(big))[0])
+
+
+class TestVisualizerOptionalDeps(unittest.TestCase):
+    """Test visualizer helpers with and without the optional numpy/networkx"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.graph = CallGraph()
+        for i in range(6):
+            self.graph.add_function(FunctionInfo(
+                name=f"f{i}", file="mod.py", line=i + 1, calls={f"f{i + 1}", "print"}
+            ))
+        # Average call times 1..6 ms, f5 never called
+        self.trace_stats = {
+            f"f{i}": {"call_count": 2, "total_time": 0.002 * (i + 1)} for i in range(5)
+        }
+        self.trace_stats["f5"] = {"call_count": 0, "total_time": 0}
+    
+    def test_trace_percentiles_fallback(self):
+        """Test percentiles are selected by sorting without numpy"""
+        with patch.object(visualizer, "np", None):
+            p50, p90 = visualizer._trace_percentiles(self.trace_stats)
+        self.assertAlmostEqual(p50, 0.003)
+        self.assertAlmostEqual(p90, 0.005)
+        self.assertEqual(visualizer._trace_percentiles({}), (0.001, 0.01))
+    
+    @unittest.skipIf(visualizer.np is None, "numpy not installed")
+    def test_trace_percentiles_numpy(self):
+        """Test the numpy path selects the same percentiles"""
+        with patch.object(visualizer, "np", None):
+            expected = visualizer._trace_percentiles(self.trace_stats)
+        p50, p90 = visualizer._trace_percentiles(self.trace_stats)
+        self.assertAlmostEqual(p50, expected[0])
+        self.assertAlmostEqual(p90, expected[1])
+    
+    def test_executed_node_stats_fallback(self):
+        """Test speed buckets without numpy; unexecuted functions are left out"""
+        with patch.object(visualizer, "np", None):
+            stats = visualizer._executed_node_stats(self.graph, self.trace_stats, 0.003, 0.005)
+        self.assertNotIn("f5", stats)
+        self.assertEqual([stats[f"f{i}"][0] for i in range(5)], [1, 1, 2, 2, 3])
+        bucket, calls, total, avg, _ = stats["f0"]
+        self.assertEqual(calls, 2)
+        self.assertAlmostEqual(avg, 0.001)
+    
+    @unittest.skipIf(visualizer.np is None, "numpy not installed")
+    def test_executed_node_stats_numpy(self):
+        """Test the vectorized buckets match the Python ones"""
+        with patch.object(visualizer, "np", None):
+            expected = visualizer._executed_node_stats(self.graph, self.trace_stats, 0.003, 0.005)
+        self.assertEqual(visualizer._executed_node_stats(self.graph, self.trace_stats, 0.003, 0.005),
+                         expected)
+    
+    def test_static_layout_unavailable(self):
+        """Test static layout reports None without networkx"""
+        with patch.object(visualizer, "nx", None):
+            self.assertIsNone(visualizer._static_layout(self.graph))
+    
+    @unittest.skipIf(visualizer.nx is None or visualizer.np is None, "networkx/numpy not installed")
+    def test_static_layout(self):
+        """Test static layout places every node"""
+        positions = visualizer._static_layout(self.graph)
+        self.assertEqual(set(positions), set(self.graph.nodes))
+
+
+class TestRenderCache(unittest.TestCase):
+    """Test reuse and eviction of rendered graph pages"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.visualizer = visualizer.Visualizer()
+        self.visualizer.output_dir = Path(self.temp_dir)
+        self.graph = self._graph(visualizer.SMALL_GRAPH_NODES + 1)
+        
+        # Fresh cache, and count how often a page is actually built
+        cache_patch = patch.object(visualizer.Visualizer, "_render_cache", OrderedDict())
+        cache_patch.start()
+        self.addCleanup(cache_patch.stop)
+        build_patch = patch.object(visualizer.Visualizer, "_build_network", autospec=True,
+                                   side_effect=visualizer.Visualizer._build_network)
+        self.build = build_patch.start()
+        self.addCleanup(build_patch.stop)
+    
+    def tearDown(self):
+        """Clean up"""
+        shutil.rmtree(self.temp_dir)
+    
+    @staticmethod
+    def _graph(node_count):
+        """Chain graph f0 -> f1 -> ... with node_count nodes"""
+        graph = CallGraph()
+        for i in range(node_count):
+            graph.add_function(FunctionInfo(name=f"f{i}", file="mod.py", line=i + 1,
+                                            calls={f"f{i + 1}"}))
+        return graph
+    
+    def test_cache_hit(self):
+        """Test an unchanged graph reuses the page; a changed one is rebuilt"""
+        path = self.visualizer.render(self.graph, "a.html")
+        first = Path(path).read_bytes()
+        
+        second_path = self.visualizer.render(self.graph, "b.html")
+        self.assertEqual(self.build.call_count, 1)
+        self.assertEqual(Path(second_path).read_bytes(), first)
+        
+        self.graph.nodes["f0"].docstring = "changed"
+        self.visualizer.render(self.graph, "a.html")
+        self.assertEqual(self.build.call_count, 2)
+    
+    def test_small_graphs_not_cached(self):
+        """Test graphs up to SMALL_GRAPH_NODES are always rebuilt"""
+        small = self._graph(visualizer.SMALL_GRAPH_NODES)
+        self.visualizer.render(small)
+        self.visualizer.render(small)
+        
+        self.assertEqual(self.build.call_count, 2)
+        self.assertEqual(len(visualizer.Visualizer._render_cache), 0)
+    
+    def test_cache_eviction(self):
+        """Test the least recently used page is evicted past RENDER_CACHE_SIZE"""
+        with patch.object(visualizer, "RENDER_CACHE_SIZE", 2):
+            for iterations in (10, 20, 30):
+                self.visualizer.render(self.graph, stabilization_iterations=iterations)
+            self.assertEqual(len(visualizer.Visualizer._render_cache), 2)
+            
+            self.visualizer.render(self.graph, stabilization_iterations=30)
+            self.assertEqual(self.build.call_count, 3)
+            self.visualizer.render(self.graph, stabilization_iterations=10)
+            self.assertEqual(self.build.call_count, 4)
+
+
+@unittest.skipIf(LintHighlighter is None, "PyQt5 not installed")
+class TestLintHighlighter(unittest.TestCase):
+    """Test lint error underlines"""
+    
+    @classmethod
+    def setUpClass(cls):
+        """Create the Qt application (headless when there is no display)"""
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        cls.app = QApplication.instance() or QApplication([])
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.document = QTextDocument("\n".join(f"x{i} = {i}" for i in range(30)))
+        self.highlighter = LintHighlighter(self.document)
+    
+    def _underlined_lines(self):
+        """1-based numbers of the lines carrying an error underline"""
+        lines = []
+        block = self.document.begin()
+        while block.isValid():
+            if any(fmt.format.underlineStyle() for fmt in block.layout().formats()):
+                lines.append(block.blockNumber() + 1)
+            block = block.next()
+        return lines
+    
+    def test_errors_indexed_by_line(self):
+        """Test only error lines are underlined, from the error column on"""
+        self.highlighter.set_errors([{"line": 3, "column": 2}, {"line": 3}, {"line": 10}])
+        
+        self.assertEqual(sorted(self.highlighter._errors_by_line), [3, 10])
+        self.assertEqual(len(self.highlighter._errors_by_line[3]), 2)
+        self.assertEqual(self._underlined_lines(), [3, 10])
+        
+        self.highlighter.set_errors([{"line": 10}, {"line": 20}])
+        self.assertEqual(self._underlined_lines(), [10, 20])
+        self.highlighter.set_errors([])
+        self.assertEqual(self._underlined_lines(), [])
+    
+    def test_errors_after_lines_inserted(self):
+        """Test underlines that moved with inserted lines are repainted"""
+        self.highlighter.set_errors([{"line": 5}])
+        QTextCursor(self.document.begin()).insertText("a\nb\n")
+        
+        self.highlighter.set_errors([{"line": 5}])
+        
+        self.assertEqual(self._underlined_lines(), [5])
+    
+    def test_typing_on_error_line(self):
+        """Test re-highlighting an error line keeps one tracking entry"""
+        self.highlighter.set_errors([{"line": 5}])
+        cursor = QTextCursor(self.document.findBlockByNumber(4))
+        cursor.movePosition(QTextCursor.EndOfBlock)
+        for _ in range(20):
+            cursor.insertText("y")
+            self.highlighter.set_errors([{"line": 5}])
+        
+        self.assertEqual(list(self.highlighter._underlined_blocks), [4])
+        self.assertEqual(self._underlined_lines(), [5])
+
+
 class TestSecretManager(unittest.TestCase):
     """Test secret manager"""
     
@@ -468,7 +962,13 @@ def run_tests(verbosity=2):
     
     # Add test classes
     suite.addTests(loader.loadTestsFromTestCase(TestFunctionFlowAnalyzer))
+    suite.addTests(loader.loadTestsFromTestCase(TestProjectAnalysis))
     suite.addTests(loader.loadTestsFromTestCase(TestGraphBuilder))
+    suite.addTests(loader.loadTestsFromTestCase(TestCallGraph))
+    suite.addTests(loader.loadTestsFromTestCase(TestSecurity))
+    suite.addTests(loader.loadTestsFromTestCase(TestVisualizerOptionalDeps))
+    suite.addTests(loader.loadTestsFromTestCase(TestRenderCache))
+    suite.addTests(loader.loadTestsFromTestCase(TestLintHighlighter))
     suite.addTests(loader.loadTestsFromTestCase(TestSecretManager))
     suite.addTests(loader.loadTestsFromTestCase(TestRequestCache))
     suite.addTests(loader.loadTestsFromTestCase(TestRateLimiter))